@@ -1,231 +1,792 @@
-import pandas as pd
-import plotly.express as px
-import dash 
-from dash import html, dcc, Input, Output, dash_table
-import folium
-from folium.plugins import MarkerCluster
-import base64
-import io
-from dash.exceptions import PreventUpdate
-
-# Load data
-df = pd.read_excel("maindataset.xlsx")
-df.rename(columns={"Longitudes": "Longitude"}, inplace=True)
-
-df["Latitude"] = pd.to_numeric(df["Latitude"], errors='coerce')
-df["Longitude"] = pd.to_numeric(df["Longitude"], errors='coerce')
-df["SS_FisYearName"] = pd.to_datetime(df["SS_FisYearName"], errors='coerce', unit='D', origin='1899-12-30').dt.year
-df.dropna(subset=["SS_FisYearName"], inplace=True)
-df["SS_FisYearName"] = df["SS_FisYearName"].astype(int)
-
-total_substations = len(df)
-unique_regions = df["Region"].nunique()
-avg_spend = df[["Planning Plant", "Maintenence Plant"]].mean().mean()
-
-app = dash.Dash(__name__, suppress_callback_exceptions=True)
-app.title = "⚡ Substation Intelligence Platform"
-
-app.css.append_css({
-    'external_url': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css'
-})
-
-app.layout = html.Div([
-    html.Div([
+import functools
+import json
+import math
+import os
+import numpy as np
+from flask import Response, abort, request
+
+from substation_cache import DiskCache, ResultCache, filter_key, normalize_filters
+from substation_clusters import ClusterIndex
+from substation_data import CACHE_DIR, prune_shared, shared_dir
+from substation_download import FORMATS, PARQUET
+from substation_memory import process_memory
+from substation_metrics import RequestMetrics, profile_writer
+from substation_payload import compress_responses, conditional_json, json_size, slim_figure, slim_html
+from substation_snapshot import SnapshotManager
+from substation_spatial import network_segments
+from substation_table import TABLE_COLUMNS
+
+# Per-callback latency, stage timings and response sizes, served at /metrics and
+# in Server-Timing headers. SUBSTATION_PROFILE_RATE of requests are profiled and
+# those slower than SUBSTATION_SLOW_MS leave a .pstats file in SUBSTATION_PROFILE_DIR
+metrics = RequestMetrics(
+    profile_rate=float(os.environ.get("SUBSTATION_PROFILE_RATE", "0")),
+    slow_seconds=float(os.environ.get("SUBSTATION_SLOW_MS", "1000")) / 1000,
+    on_slow=profile_writer(os.environ.get("SUBSTATION_PROFILE_DIR", os.path.join(CACHE_DIR, "profiles"))),
+)
+
+# The dataset and its indexes live in a versioned snapshot; a background
+# watcher swaps in a new one when maindataset.xlsx changes. Every cache key
+# starts with the snapshot version, so a swap only drops that version's entries.
+RELOAD_INTERVAL = float(os.environ.get("SUBSTATION_RELOAD_INTERVAL", "5"))
+
+# Filtered row positions stay on the server; the browser only holds the filter key
+result_cache = ResultCache(max_bytes=int(os.environ.get("SUBSTATION_RESULT_CACHE_MB", "256")) * 2**20)
+
+MAP_TYPES = ("light", "dark", "satellite")
+
+# Rendered maps: the tile-free marker/line document per filter key, and the
+# final HTML per (filter key, map type) so style switches never re-render markers
+map_layer_cache = ResultCache(max_bytes=int(os.environ.get("SUBSTATION_MAP_CACHE_MB", "128")) * 2**20)
+map_html_cache = ResultCache(max_bytes=int(os.environ.get("SUBSTATION_MAP_CACHE_MB", "128")) * 2**20)
+network_cache = ResultCache(max_bytes=int(os.environ.get("SUBSTATION_NETWORK_CACHE_MB", "64")) * 2**20,
+                            sizer=lambda segments: sum(pairs.nbytes for pairs in segments.values()) + 1)
+
+# Above this many mapped substations the map loads markers per viewport
+# from /api/map/viewport instead of embedding them all in the document
+VIEWPORT_THRESHOLD = int(os.environ.get("SUBSTATION_VIEWPORT_THRESHOLD", "5000"))
+VIEWPORT_LIMIT = 2000
+LINE_MIN_ZOOM = 9
+cluster_cache = ResultCache(max_bytes=int(os.environ.get("SUBSTATION_CLUSTER_CACHE_MB", "128")) * 2**20,
+                            sizer=lambda index: index.nbytes)
+
+VERSIONED_CACHES = [result_cache, map_layer_cache, map_html_cache, network_cache, cluster_cache]
+
+# /api/substations pages its rows: API_PAGE_SIZE by default, at most
+# SUBSTATION_API_MAX_ROWS per request
+API_PAGE_SIZE = 1000
+API_MAX_ROWS = int(os.environ.get("SUBSTATION_API_MAX_ROWS", "10000"))
+
+# /api/substations.csv and .parquet stream any number of rows,
+# SUBSTATION_EXPORT_CHUNK_ROWS at a time
+EXPORT_CHUNK_ROWS = int(os.environ.get("SUBSTATION_EXPORT_CHUNK_ROWS", "20000"))
+
+# Maps not cached yet are built as background jobs on SUBSTATION_MAP_JOB_THREADS
+# threads per worker, which the page polls every SUBSTATION_MAP_POLL_MS; a newer
+# filter cancels the build it supersedes. Job results and state are kept on
+# disk (SUBSTATION_JOB_CACHE_MB) so any worker can answer a poll
+MAP_JOB_THREADS = int(os.environ.get("SUBSTATION_MAP_JOB_THREADS", "1"))
+MAP_POLL_MS = int(os.environ.get("SUBSTATION_MAP_POLL_MS", "250"))
+JOB_CACHE_MB = int(os.environ.get("SUBSTATION_JOB_CACHE_MB", "256"))
+
+# Rendered map layers and network lines are also kept on disk, in a directory
+# per snapshot version, so one gunicorn worker's work is reused by the others
+SHARED_CACHE_MB = int(os.environ.get("SUBSTATION_SHARED_CACHE_MB", "512"))
+
+
+def open_shared_cache(snap):
+    return DiskCache(shared_dir(snap.version), SHARED_CACHE_MB * 2**20)
+
+
+# Filters behind the most recently used filter keys, so a delta swap can tell
+# which cached results it leaves untouched. Bounded like the caches it serves:
+# a key that has fallen out of it is treated as touched, so its results are
+# rebuilt rather than carried over
+FILTER_HISTORY = 4096
+cached_filters = ResultCache(max_bytes=FILTER_HISTORY, sizer=lambda filters: 1)
+
+
+def cache_key(snap, store):
+    cached_filters.put(store["key"], store["filters"])
+    return snap.version, store["key"]
+
+
+def on_snapshot_swap(old, new):
+    global shared_cache
+    previous = shared_cache if shared_cache is not None else open_shared_cache(old)
+    shared_cache = open_shared_cache(new)
+    # Workers swap a poll apart, so the old version's directory stays for those still on it
+    prune_shared(keep={old.version, new.version})
+
+    def stale(key):
+        return key[0] == old.version
+
+    if new.parent != old.version:
+        cached_filters.clear()
+        for cache in VERSIONED_CACHES:
+            cache.discard(stale)
+        return
+
+    # A delta swap: whatever the delta left untouched moves to the new version
+    # as it is, filtered rows it touched are patched, and the maps, networks and
+    # clusters of touched filters are dropped to be rebuilt on demand
+    filters_of = dict(cached_filters.items())
+    untouched = {key for key, filters in filters_of.items() if not new.touches(filters)}
+
+    def carry(key, value):
+        return ((new.version,) + key[1:], value) if key[1] in untouched else None
+
+    def carry_rows(key, rows):
+        if key[1] not in filters_of:
+            return None
+        return (new.version,) + key[1:], new.carry_rows(rows, filters_of[key[1]])
+
+    result_cache.discard(stale, lambda key, rows: carry(key, rows) or carry_rows(key, rows))
+    for cache in (map_layer_cache, map_html_cache, network_cache, cluster_cache):
+        cache.discard(stale, carry)
+    shared_cache.adopt(previous, [((kind, old.version, key), (kind, new.version, key))
+                                  for kind in ("map_layers", "network") for key in untouched])
+
+
+# Nothing is read until the first request needs the dataset (or preload() is
+# called, as the gunicorn master does before forking its workers)
+snapshots = SnapshotManager(interval=RELOAD_INTERVAL, on_swap=on_snapshot_swap)
+shared_cache = None
+
+
+def current_snapshot():
+    return snapshots.get()
+
+
+def preload():
+    """Load the dataset and the map and chart libraries now rather than on first use."""
+    import substation_map  # noqa: F401
+
+    get_shared_cache()
+    chart_skeletons()
+    return snapshots.current
+
+
+def get_shared_cache():
+    global shared_cache
+    if shared_cache is None:
+        shared_cache = open_shared_cache(snapshots.current)
+    return shared_cache
+
+
+def get_shared(key, build):
+    return get_shared_cache().get_or_build(key, build)
+
+
+def get_rows(snap, store):
+    filters = store["filters"]
+    with metrics.stage("filter"):
+        return result_cache.get_or_build(cache_key(snap, store), lambda: snap.filter_index.rows(**filters))
+
+
+def get_filtered(snap, store):
+    rows = get_rows(snap, store)
+    return snap.df if len(rows) == len(snap.df) else snap.df.take(rows)
+
+
+def get_segments(snap, store):
+    key = cache_key(snap, store)
+    return network_cache.get_or_build(
+        key, lambda: get_shared(("network",) + key, lambda: network_segments(get_filtered(snap, store))))
+
+
+def get_clusters(snap, store):
+    def build():
+        rows = get_rows(snap, store)
+        lat = snap.df["Latitude"].to_numpy(dtype=float)[rows]
+        lon = snap.df["Longitude"].to_numpy(dtype=float)[rows]
+        mapped = ~(np.isnan(lat) | np.isnan(lon))
+        return ClusterIndex(lat[mapped], lon[mapped], rows[mapped])
+
+    return cluster_cache.get_or_build(cache_key(snap, store), build)
+
+
+def no_progress(label):
+    pass
+
+
+def render_map_layers(snap, store, progress=no_progress):
+    # folium (and branca) load with the first map rather than with the app
+    from dash import get_relative_path
+    from substation_map import render_layers, render_viewport_layers
+
+    progress("Selecting substations")
+    dff = get_filtered(snap, store)
+    if dff["Latitude"].notna().sum() > VIEWPORT_THRESHOLD:
+        progress("Rendering map")
+        html = render_viewport_layers(dff, get_relative_path("/api/map/viewport"), store["filters"])
+    else:
+        progress("Drawing network lines")
+        segments = get_segments(snap, store)
+        progress("Placing markers")
+        html = render_layers(dff, segments, progress)
+    slim = slim_html(html)
+    metrics.record_output("map.srcDoc", json_size(html), json_size(slim))
+    return slim
+
+
+@functools.lru_cache(maxsize=None)
+def job_manager():
+    """Runs background callbacks (map builds); one per process, shared by every app."""
+    from substation_jobs import JobManager
+
+    return JobManager(os.path.join(CACHE_DIR, "jobs"), JOB_CACHE_MB * 2**20,
+                      threads=MAP_JOB_THREADS, on_finish=metrics.record_job)
+
+
+@functools.lru_cache(maxsize=None)
+def chart_skeletons():
+    """Chart figures by output, slimmed, with their encoded sizes.
+
+    Built once, on the first page load; they ship with the layout and filter
+    changes only patch their data arrays.
+    """
+    from substation_figures import pie_skeleton, trend_skeleton
+
+    figures = {"spend-trend-chart.figure": slim_figure(trend_skeleton()),
+               "ownership-pie-chart.figure": slim_figure(pie_skeleton())}
+    return {output: (figure, json_size(figure)) for output, figure in figures.items()}
+
+
+def patch_output(output, patch):
+    """``patch`` as sent, its size recorded under ``output`` next to the full figure it stands for."""
+    patch_bytes = json_size(patch)
+    metrics.record_output(output, chart_skeletons()[output][1] + patch_bytes, patch_bytes)
+    return patch
+
+
+def get_map_html(snap, store, map_type, progress=no_progress):
+    """The map document for a filter and map type, rendering what is not cached.
+
+    ``progress(label)`` is called before each rendering stage; a background
+    job reports it to the page and is stopped there once cancelled.
+    """
+    from substation_map import apply_tiles
+
+    key = cache_key(snap, store)
+
+    def build():
+        layers = map_layer_cache.get_or_build(
+            key, lambda: get_shared(("map_layers",) + key, lambda: render_map_layers(snap, store, progress)))
+        return apply_tiles(layers, map_type)
+
+    with metrics.stage("map"):
+        return map_html_cache.get_or_build(key + (map_type,), build)
+
+
+def cached_map_html(snap, store, map_type):
+    """The map document if its layers are cached in this worker or on disk, else None."""
+    from substation_map import apply_tiles
+
+    key = cache_key(snap, store)
+    html = map_html_cache.get(key + (map_type,))
+    if html is None:
+        layers = map_layer_cache.get(key) or get_shared_cache().get(("map_layers",) + key)
+        if layers is not None:
+            map_layer_cache.put(key, layers)
+            html = map_html_cache.put(key + (map_type,), apply_tiles(layers, map_type))
+    return html
+
+
+def get_summary(snap, store):
+    filters = store["filters"]
+    # The cube has no spatial axis; radius and box searches are binned from their rows
+    if filters.get("near") or filters.get("bbox"):
+        rows = get_rows(snap, store)
+        with metrics.stage("aggregate"):
+            return snap.spend_cube.summary_rows(rows)
+    with metrics.stage("aggregate"):
+        return snap.spend_cube.summary(filters["regions"], filters["ownerships"], filters["years"])
+
+
+def find_substations(lat=None, lon=None, radius_km=None, k=None, bbox=None):
+    """Substations within radius_km of (lat, lon), its k nearest, or inside bbox.
+
+    bbox is (south, west, north, east). When a point is given the rows carry a
+    "Distance (km)" column and come back closest first.
+    """
+    snap = current_snapshot()
+    spatial = snap.filter_index.spatial
+    if bbox is not None:
+        rows = spatial.within_bbox(*bbox)
+    elif k is not None:
+        rows, _ = spatial.nearest(lat, lon, k)
+    else:
+        rows = spatial.within_radius(lat, lon, radius_km)
+    result = snap.df.take(rows)
+    if lat is None or lon is None:
+        return result
+    result = result.assign(**{"Distance (km)": spatial.distances_km(rows, lat, lon)})
+    if radius_km is not None:
+        result = result[result["Distance (km)"] <= radius_km]
+    return result.sort_values("Distance (km)", kind="stable")
+
+
+def format_metrics(summary):
+    avg_spend = summary["avg_spend"]
+    return (
+        f"{summary['total']:,}",
+        f"{summary['regions']}",
+        "N/A" if avg_spend != avg_spend else f"${avg_spend:,.0f}",
+    )
+
+
+# Callbacks are declared against "component-id.property" strings and
+# registered on the app by create_app, so importing this module imports no Dash
+CALLBACKS = []
+
+
+def callback(outputs, inputs, states=(), **kwargs):
+    """Declare a server callback; its requests are timed under its name.
+
+    Background callbacks name their ``progress`` outputs and ``running``
+    (output, on, off) triples the same way; ``allow_duplicate`` applies to
+    every output.
+    """
+    def declare(func):
+        CALLBACKS.append((None, outputs, inputs, states, kwargs, func))
+        return func
+    return declare
+
+
+def clientside_callback(script, outputs, inputs, states=(), **kwargs):
+    """Declare a callback that runs ``script`` in the browser."""
+    CALLBACKS.append((script, outputs, inputs, states, kwargs, None))
+
+
+def register_callbacks(app):
+    from dash import Input, Output, State
+
+    def dependencies(kind, specs, **options):
+        if isinstance(specs, str):
+            return kind(*specs.rsplit(".", 1), **options)
+        return [kind(*spec.rsplit(".", 1), **options) for spec in specs]
+
+    for script, outputs, inputs, states, kwargs, func in CALLBACKS:
+        kwargs = dict(kwargs)
+        duplicate = {"allow_duplicate": True} if kwargs.pop("allow_duplicate", False) else {}
+        if "progress" in kwargs:
+            kwargs["progress"] = dependencies(Output, kwargs["progress"])
+        if "running" in kwargs:
+            kwargs["running"] = [(dependencies(Output, spec), on, off) for spec, on, off in kwargs["running"]]
+        args = (dependencies(Output, outputs, **duplicate), dependencies(Input, inputs),
+                dependencies(State, states))
+        if script is not None:
+            app.clientside_callback(script, *args, **kwargs)
+        else:
+            app.callback(*args, **kwargs)(metrics.callback(func))
+
+
+def prevent_update_if_none(value):
+    """Stop the callback without updating its outputs while ``value`` is unset."""
+    if value is None:
+        from dash.exceptions import PreventUpdate
+        raise PreventUpdate
+
+
+def checked_store(data):
+    """The filter store a client sent back, rebuilt on the server.
+
+    The filters are normalized again and the key recomputed from them, so a
+    forged store cannot put one filter's rows or maps under another's key.
+    A store that does not parse stops the callback.
+    """
+    from dash.exceptions import PreventUpdate
+
+    prevent_update_if_none(data)
+    try:
+        filters = normalize_filters(**data["filters"])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        raise PreventUpdate
+    return {"key": filter_key(filters), "filters": filters}
+
+
+def checked_map_type(map_type):
+    if map_type not in MAP_TYPES:
+        from dash.exceptions import PreventUpdate
+        raise PreventUpdate
+    return map_type
+
+
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+def map_viewport():
+    try:
+        filters = normalize_filters(**json.loads(request.args.get("filters", "{}")))
+        zoom = int(float(request.args["z"]))
+        bounds = [float(request.args[k]) for k in ("south", "west", "north", "east")]
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        abort(400)
+    store = {"key": filter_key(filters), "filters": filters}
+    snap = current_snapshot()
+
+    clusters, points, truncated = get_clusters(snap, store).query(zoom, *bounds, limit=VIEWPORT_LIMIT)
+    rows = points[:, 2].astype(np.int64)
+    records = snap.table_index.records(rows)
+    segments = []
+    if zoom >= LINE_MIN_ZOOM:
+        south, west, north, east = bounds
+        for pairs in get_segments(snap, store).values():
+            lat, lon = pairs[:, :, 0], pairs[:, :, 1]
+            visible = ((lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)).any(axis=1)
+            segments.extend(pairs[visible].round(6).tolist())
+        truncated = truncated or len(segments) > VIEWPORT_LIMIT
+        segments = segments[:VIEWPORT_LIMIT]
+    # Region and ownership repeat across points, so they go as codes into small tables
+    regions, owners = {}, {}
+    return {
+        "clusters": [[round(lat, 6), round(lon, 6), int(n)] for lat, lon, n in clusters.tolist()],
+        "points": [
+            [round(lat, 6), round(lon, 6), record["Substation Name"],
+             regions.setdefault(record["Region"], len(regions)),
+             owners.setdefault(record["Substation Ownership"], len(owners)),
+             record["SS_FisYearName"]]
+            for (lat, lon, _), record in zip(points.tolist(), records)
+        ],
+        "regions": list(regions),
+        "owners": list(owners),
+        "segments": segments,
+        "truncated": bool(truncated),
+    }
+
+
+def cache_stats():
+    return {
+        "results": result_cache.stats(),
+        "map_layers": map_layer_cache.stats(),
+        "map_html": map_html_cache.stats(),
+        "network": network_cache.stats(),
+        "clusters": cluster_cache.stats(),
+        "shared": get_shared_cache().stats(),
+        "jobs": job_manager().store.stats(),
+        "dataset": snapshots.stats(),
+    }
+
+
+def worker_memory():
+    return {**process_memory(), "ppid": os.getppid()}
+
+
+def api_numbers(name, count, cast=float):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    numbers = [cast(part) for part in value.split(",")]
+    if len(numbers) != count or not all(math.isfinite(number) for number in numbers):
+        raise ValueError(f"{name} takes {count} comma-separated finite numbers")
+    return numbers
+
+
+def api_filters():
+    """Filters from the query string.
+
+    ``region`` and ``ownership`` may repeat; ``years`` is FIRST,LAST, ``near``
+    is LAT,LON,KM and ``bbox`` is SOUTH,WEST,NORTH,EAST.
+    """
+    return normalize_filters(request.args.getlist("region"), request.args.getlist("ownership"),
+                             api_numbers("years", 2, int), api_numbers("near", 3), api_numbers("bbox", 4))
+
+
+def api_etag(snap, endpoint, query):
+    # The same query on the same dataset version always gets the same tag
+    return f"{snap.version}-{filter_key({'endpoint': endpoint, **query})}"
+
+
+def api_columns(snap):
+    columns = request.args.get("columns")
+    columns = columns.split(",") if columns else list(snap.df.columns)
+    if not set(columns) <= set(snap.df.columns):
+        abort(400)
+    return columns
+
+
+def json_floats(values):
+    return [None if value != value else round(float(value), 6) for value in values]
+
+
+def query_substations():
+    try:
+        filters = api_filters()
+        offset = max(int(request.args.get("offset", 0)), 0)
+        limit = min(max(int(request.args.get("limit", API_PAGE_SIZE)), 0), API_MAX_ROWS)
+    except (TypeError, ValueError):
+        abort(400)
+    snap = current_snapshot()
+    columns = api_columns(snap)
+    store = {"key": filter_key(filters), "filters": filters}
+
+    def build():
+        rows = get_rows(snap, store)
+        with metrics.stage("table"):
+            page = snap.df.take(rows[offset:offset + limit])[columns]
+            # pandas writes the records several times faster than decoding
+            # them for jsonify, so they are spliced into the body as written
+            records = page.to_json(orient="records", double_precision=6)
+        head = json.dumps({"version": snap.version, "filters": filters, "total": len(rows),
+                           "offset": offset, "limit": limit})
+        return f'{head[:-1]}, "rows": {records}}}'
+
+    query = {**filters, "offset": offset, "limit": limit, "columns": columns}
+    return conditional_json(api_etag(snap, "substations", query), build)
+
+
+def query_summary():
+    try:
+        filters = api_filters()
+    except (TypeError, ValueError):
+        abort(400)
+    snap = current_snapshot()
+    store = {"key": filter_key(filters), "filters": filters}
+
+    def build():
+        summary = get_summary(snap, store)
+        return {
+            "version": snap.version,
+            "filters": filters,
+            "total": summary["total"],
+            "regions": summary["regions"],
+            "avg_spend": json_floats([summary["avg_spend"]])[0],
+            "ownership_counts": summary["ownership_counts"],
+            "years": [int(year) for year in summary["years"]],
+            "year_means": {measure: json_floats(means) for measure, means in summary["year_means"].items()},
+        }
+
+    return conditional_json(api_etag(snap, "summary", filters), build)
+
+
+def export_substations(fmt):
+    if fmt not in FORMATS:
+        abort(404)
+    try:
+        filters = api_filters()
+    except (TypeError, ValueError):
+        abort(400)
+    snap = current_snapshot()
+    columns = api_columns(snap)
+    rows = get_rows(snap, {"key": filter_key(filters), "filters": filters})
+    mimetype, write = FORMATS[fmt]
+    # The generator holds this snapshot, so a reload mid-download does not mix versions
+    return Response(write(snap.df, rows, columns, EXPORT_CHUNK_ROWS), mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="substations-{snap.version[:12]}.{fmt}"'})
+
+
+def serve_layout():
+    # Built on every page load, so a reloaded dataset shows up in the cards and filters
+    from dash import dash_table, dcc, get_relative_path, html
+
+    snap = current_snapshot()
+    skeletons = chart_skeletons()
+    total_substations, unique_regions, avg_spend = format_metrics(snap.spend_cube.summary())
+    return html.Div([
         html.Div([
-            html.H1("Substation Intelligence Platform", className="app-title"),
-            html.P("Comprehensive analytics for energy infrastructure", className="app-subtitle")
-        ], className="title-container"),
+            html.Div([
+                html.H1("Substation Intelligence Platform", className="app-title"),
+                html.P("Comprehensive analytics for energy infrastructure", className="app-subtitle")
+            ], className="title-container"),
         
-        html.Button(
-            id="dark-toggle",
-            className="dark-toggle-btn",
-            children=[
-                html.Span("☀️", className="sun-icon"),
-                html.Span("🌙", className="moon-icon")
-            ],
-            n_clicks=0
-        )
-    ], className="app-header"),
+            html.Button(
+                id="dark-toggle",
+                className="dark-toggle-btn",
+                children=[
+                    html.Span("☀️", className="sun-icon"),
+                    html.Span("🌙", className="moon-icon")
+                ],
+                n_clicks=0
+            )
+        ], className="app-header"),
     
-    # Metrics Cards Row
-    html.Div([
+        # Metrics Cards Row
         html.Div([
             html.Div([
                 html.Div([
-                    html.P("Total Substations", className="card-title"),
-                    html.H3(f"{total_substations:,}", className="card-value")
-                ], className="card-content"),
-                html.Div(className="card-icon", children=html.I(className="fas fa-bolt"))
-            ], className="metric-card", id="card-1")
-        ], className="card-column"),
+                    html.Div([
+                        html.P("Total Substations", className="card-title"),
+                        html.H3(total_substations, id="total-substations-value", className="card-value")
+                    ], className="card-content"),
+                    html.Div(className="card-icon", children=html.I(className="fas fa-bolt"))
+                ], className="metric-card", id="card-1")
+            ], className="card-column"),
         
-        html.Div([
             html.Div([
                 html.Div([
-                    html.P("Regions Covered", className="card-title"),
-                    html.H3(f"{unique_regions}", className="card-value")
-                ], className="card-content"),
-                html.Div(className="card-icon", children=html.I(className="fas fa-map-marked-alt"))
-            ], className="metric-card", id="card-2")
-        ], className="card-column"),
+                    html.Div([
+                        html.P("Regions Covered", className="card-title"),
+                        html.H3(unique_regions, id="regions-covered-value", className="card-value")
+                    ], className="card-content"),
+                    html.Div(className="card-icon", children=html.I(className="fas fa-map-marked-alt"))
+                ], className="metric-card", id="card-2")
+            ], className="card-column"),
         
-        html.Div([
             html.Div([
                 html.Div([
-                    html.P("Avg Spend", className="card-title"),
-                    html.H3(f"${avg_spend:,.0f}", className="card-value")
-                ], className="card-content"),
-                html.Div(className="card-icon", children=html.I(className="fas fa-chart-line"))
-            ], className="metric-card", id="card-3")
-        ], className="card-column"),
+                    html.Div([
+                        html.P("Avg Spend", className="card-title"),
+                        html.H3(avg_spend, id="avg-spend-value", className="card-value")
+                    ], className="card-content"),
+                    html.Div(className="card-icon", children=html.I(className="fas fa-chart-line"))
+                ], className="metric-card", id="card-3")
+            ], className="card-column"),
         
-        html.Div([
             html.Div([
                 html.Div([
-                    html.P("Data Updated", className="card-title"),
-                    html.H3("Q2 2023", className="card-value")
-                ], className="card-content"),
-                html.Div(className="card-icon", children=html.I(className="fas fa-calendar-check"))
-            ], className="metric-card", id="card-4")
-        ], className="card-column")
-    ], className="cards-row"),
+                    html.Div([
+                        html.P("Data Updated", className="card-title"),
+                        html.H3("Q2 2023", className="card-value")
+                    ], className="card-content"),
+                    html.Div(className="card-icon", children=html.I(className="fas fa-calendar-check"))
+                ], className="metric-card", id="card-4")
+            ], className="card-column")
+        ], className="cards-row"),
     
-    # Main Content Area
-    html.Div([
-        # Filters Panel
+        # Main Content Area
         html.Div([
+            # Filters Panel
             html.Div([
-                html.H4("FILTERS", className="filters-title"),
-                html.Hr(className="divider"),
+                html.Div([
+                    html.H4("FILTERS", className="filters-title"),
+                    html.Hr(className="divider"),
+                
+                    html.Label("Select Regions", className="filter-label"),
+                    dcc.Dropdown(
+                        id="region-filter",
+                        options=[{"label": i, "value": i} for i in snap.regions],
+                        multi=True,
+                        placeholder="All Regions",
+                        className="filter-dropdown"
+                    ),
                 
-                html.Label("Select Regions", className="filter-label"),
-                dcc.Dropdown(
-                    id="region-filter",
-                    options=[{"label": i, "value": i} for i in sorted(df["Region"].dropna().unique())],
-                    multi=True,
-                    placeholder="All Regions",
-                    className="filter-dropdown"
-                ),
+                    html.Label("Ownership Type", className="filter-label"),
+                    dcc.Dropdown(
+                        id="ownership-filter",
+                        options=[{"label": i, "value": i} for i in snap.ownerships],
+                        multi=True,
+                        placeholder="All Ownership Types",
+                        className="filter-dropdown"
+                    ),
                 
-                html.Label("Ownership Type", className="filter-label"),
-                dcc.Dropdown(
-                    id="ownership-filter",
-                    options=[{"label": i, "value": i} for i in sorted(df["Substation Ownership"].dropna().unique())],
-                    multi=True,
-                    placeholder="All Ownership Types",
-                    className="filter-dropdown"
-                ),
+                    html.Label("Time Range", className="filter-label"),
+                    dcc.RangeSlider(
+                        id='year-slider',
+                        min=snap.year_range[0],
+                        max=snap.year_range[1],
+                        step=1,
+                        value=snap.year_range,
+                        marks={int(year): {'label': str(year), 'style': {'color': '#fff'}} 
+                               for year in snap.years},
+                        tooltip={"placement": "bottom", "always_visible": False},
+                        className="year-slider"
+                    ),
                 
-                html.Label("Time Range", className="filter-label"),
-                dcc.RangeSlider(
-                    id='year-slider',
-                    min=int(df["SS_FisYearName"].min()),
-                    max=int(df["SS_FisYearName"].max()),
-                    step=1,
-                    value=[int(df["SS_FisYearName"].min()), int(df["SS_FisYearName"].max())],
-                    marks={int(year): {'label': str(year), 'style': {'color': '#fff'}} 
-                           for year in sorted(df["SS_FisYearName"].unique())},
-                    tooltip={"placement": "bottom", "always_visible": False},
-                    className="year-slider"
-                ),
+                    html.Label("Radius Search", className="filter-label"),
+                    html.Div([
+                        dcc.Input(id="near-lat", type="number", placeholder="Latitude",
+                                  min=-90, max=90, className="filter-input"),
+                        dcc.Input(id="near-lon", type="number", placeholder="Longitude",
+                                  min=-180, max=180, className="filter-input"),
+                        dcc.Input(id="near-radius", type="number", placeholder="Radius (km)",
+                                  min=0, className="filter-input")
+                    ], className="radius-inputs"),
                 
-                html.Button("Apply Filters", id="apply-filters", className="apply-btn"),
-                html.Button("Reset Filters", id="reset-filters", className="reset-btn")
-            ], className="filters-panel")
-        ], className="filters-column"),
+                    html.Button("Apply Filters", id="apply-filters", className="apply-btn"),
+                    html.Button("Reset Filters", id="reset-filters", className="reset-btn")
+                ], className="filters-panel")
+            ], className="filters-column"),
         
-        # Charts and Map Area
-        html.Div([
-            # First Row - Charts
+            # Charts and Map Area
             html.Div([
+                # First Row - Charts
                 html.Div([
-                    dcc.Graph(id="spend-trend-chart", className="chart-container")
-                ], className="chart-column"),
+                    html.Div([
+                        dcc.Graph(id="spend-trend-chart", figure=skeletons["spend-trend-chart.figure"][0], className="chart-container")
+                    ], className="chart-column"),
                 
-                html.Div([
-                    dcc.Graph(id="ownership-pie-chart", className="chart-container")
-                ], className="chart-column")
-            ], className="charts-row"),
+                    html.Div([
+                        dcc.Graph(id="ownership-pie-chart", figure=skeletons["ownership-pie-chart.figure"][0], className="chart-container")
+                    ], className="chart-column")
+                ], className="charts-row"),
             
-            # Second Row - Map and Data Table
-            html.Div([
+                # Second Row - Map and Data Table
                 html.Div([
                     html.Div([
-                        html.H4("Substation Locations", className="map-title"),
                         html.Div([
-                            html.Button("Satellite", id="satellite-btn", className="map-toggle-btn"),
-                            html.Button("Dark", id="dark-btn", className="map-toggle-btn active"),
-                            html.Button("Light", id="light-btn", className="map-toggle-btn")
-                        ], className="map-toggle-group")
-                    ], className="map-header"),
-                    html.Iframe(id="map", srcDoc=None, className="map-iframe")
-                ], className="map-container"),
+                            html.H4("Substation Locations", className="map-title"),
+                            html.Span(id="map-status", className="map-status"),
+                            html.Div([
+                                html.Button("Satellite", id="satellite-btn", className="map-toggle-btn"),
+                                html.Button("Dark", id="dark-btn", className="map-toggle-btn active"),
+                                html.Button("Light", id="light-btn", className="map-toggle-btn")
+                            ], className="map-toggle-group")
+                        ], className="map-header"),
+                        html.Iframe(id="map", srcDoc=None, className="map-iframe")
+                    ], className="map-container"),
                 
-                html.Div([
-                    html.H4("Substation Data", className="table-title"),
                     html.Div([
-                        dash_table.DataTable(
-                            id='substation-table',
-                            columns=[{"name": i, "id": i} for i in ["Substation Name", "Region", "Substation Ownership", "SS_FisYearName"]],
-                            page_size=10,
-                            sort_action='native',
-                            filter_action='native',
-                            style_table={'overflowX': 'auto'},
-                            style_cell={
-                                'textAlign': 'left',
-                                'padding': '8px',
-                                'minWidth': '100px', 'width': '150px', 'maxWidth': '200px',
-                                'whiteSpace': 'normal',
-                                'height': 'auto'
-                            },
-                            style_header={
-                                'backgroundColor': 'var(--header-bg)',
-                                'fontWeight': 'bold',
-                                'border': '1px solid var(--border-color)'
-                            },
-                            style_data={
-                                'backgroundColor': 'var(--table-bg)',
-                                'color': 'var(--text-color)',
-                                'border': '1px solid var(--border-color)'
-                            },
-                            style_data_conditional=[
-                                {
-                                    'if': {'row_index': 'odd'},
-                                    'backgroundColor': 'var(--table-alt-bg)'
-                                }
-                            ]
-                        )
-                    ], className="table-container")
-                ], className="data-table-container")
-            ], className="map-table-row")
-        ], className="content-column")
-    ], className="main-content"),
+                        html.Div([
+                            html.H4("Substation Data", className="table-title"),
+                            # Plain links: the route streams the file, which a
+                            # dcc.Download would have to hold in one response
+                            html.Div([
+                                html.A("CSV", id="download-csv", className="download-btn",
+                                       href=get_relative_path("/api/substations.csv")),
+                                html.A("Parquet", id="download-parquet", className="download-btn",
+                                       href=get_relative_path("/api/substations.parquet"), hidden=not PARQUET)
+                            ], className="map-toggle-group")
+                        ], className="table-header"),
+                        html.Div([
+                            dash_table.DataTable(
+                                id='substation-table',
+                                columns=[{"name": i, "id": i, "type": "numeric" if i == "SS_FisYearName" else "text"}
+                                         for i in TABLE_COLUMNS],
+                                page_current=0,
+                                page_size=10,
+                                page_action='custom',
+                                sort_action='custom',
+                                sort_by=[],
+                                filter_action='custom',
+                                filter_query='',
+                                style_table={'overflowX': 'auto'},
+                                style_cell={
+                                    'textAlign': 'left',
+                                    'padding': '8px',
+                                    'minWidth': '100px', 'width': '150px', 'maxWidth': '200px',
+                                    'whiteSpace': 'normal',
+                                    'height': 'auto'
+                                },
+                                style_header={
+                                    'backgroundColor': 'var(--header-bg)',
+                                    'fontWeight': 'bold',
+                                    'border': '1px solid var(--border-color)'
+                                },
+                                style_data={
+                                    'backgroundColor': 'var(--table-bg)',
+                                    'color': 'var(--text-color)',
+                                    'border': '1px solid var(--border-color)'
+                                },
+                                style_data_conditional=[
+                                    {
+                                        'if': {'row_index': 'odd'},
+                                        'backgroundColor': 'var(--table-alt-bg)'
+                                    }
+                                ]
+                            )
+                        ], className="table-container")
+                    ], className="data-table-container")
+                ], className="map-table-row")
+            ], className="content-column")
+        ], className="main-content"),
     
-    html.Div([
-        html.P("© 2023 Energy Analytics Platform | v2.1.0", className="footer-text"),
         html.Div([
-            html.A(html.I(className="fab fa-github"), href="#", className="social-icon"),
-            html.A(html.I(className="fab fa-linkedin"), href="#", className="social-icon"),
-            html.A(html.I(className="fas fa-envelope"), href="#", className="social-icon")
-        ], className="social-links")
-    ], className="app-footer"),
+            html.P("© 2023 Energy Analytics Platform | v2.1.0", className="footer-text"),
+            html.Div([
+                html.A(html.I(className="fab fa-github"), href="#", className="social-icon"),
+                html.A(html.I(className="fab fa-linkedin"), href="#", className="social-icon"),
+                html.A(html.I(className="fas fa-envelope"), href="#", className="social-icon")
+            ], className="social-links")
+        ], className="app-footer"),
     
-    html.Div(id="map-type-store", style={"display": "none"}, children="dark"),
+        html.Div(id="map-type-store", style={"display": "none"}, children="dark"),
+        dcc.Store(id="map-request"),
+        dcc.Store(id="map-building", data=False),
     
-    dcc.Store(id='filtered-data-store')
-], id="main-container", className="light-mode")
-
+        dcc.Store(id='filtered-data-store'),
+        dcc.Store(id='reset-defaults', data={"years": snap.year_range})
+    ], id="main-container", className="light-mode")
 
-app.css.append_css({
-    'external_url': 'https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap'
-})
 
-app.css.append_css({
-    'external_url': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css'
-})
+STYLESHEETS = [
+    'https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap',
+    'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css',
+]
 
 # Define your CSS
-app.index_string = '''
+INDEX_STRING = '''
 <!DOCTYPE html>
 <html>
     <head>
@@ -460,6 +1021,23 @@ app.index_string = '''
                 margin: 1.5rem 0;
             }
             
+            .radius-inputs {
+                display: flex;
+                gap: 0.5rem;
+                margin-bottom: 1.5rem;
+            }
+            
+            .filter-input {
+                width: 100%;
+                min-width: 0;
+                padding: 0.5rem;
+                border: 1px solid var(--border-color);
+                border-radius: 5px;
+                background: var(--card-bg);
+                color: var(--text-color);
+                font-size: 0.8rem;
+            }
+            
             .apply-btn, .reset-btn {
                 width: 100%;
                 padding: 0.75rem;
@@ -547,7 +1125,7 @@ app.index_string = '''
                 gap: 0.5rem;
             }
             
-            .map-toggle-btn {
+            .map-toggle-btn, .download-btn {
                 padding: 0.5rem 1rem;
                 border: 1px solid var(--border-color);
                 background: transparent;
@@ -555,19 +1133,32 @@ app.index_string = '''
                 border-radius: 5px;
                 cursor: pointer;
                 font-size: 0.8rem;
+                text-decoration: none;
                 transition: var(--transition);
             }
             
-            .map-toggle-btn:hover, .map-toggle-btn.active {
+            .map-toggle-btn:hover, .map-toggle-btn.active, .download-btn:hover {
                 background: var(--primary-color);
                 color: white;
                 border-color: var(--primary-color);
             }
             
+            .map-status {
+                margin-left: auto;
+                margin-right: 1rem;
+                font-size: 0.85rem;
+                color: var(--text-light);
+            }
+            
             .map-iframe {
                 width: 100%;
                 height: calc(500px - 60px);
                 border: none;
+                transition: var(--transition);
+            }
+            
+            .map-iframe-stale {
+                opacity: 0.5;
             }
             
             .data-table-container {
@@ -577,12 +1168,18 @@ app.index_string = '''
                 overflow: hidden;
             }
             
+            .table-header {
+                display: flex;
+                justify-content: space-between;
+                align-items: center;
+                padding: 1rem 1.5rem;
+                border-bottom: 1px solid var(--border-color);
+            }
+            
             .table-title {
                 font-size: 1.1rem;
-                padding: 1rem 1.5rem;
                 margin-bottom: 0;
                 color: var(--primary-color);
-                border-bottom: 1px solid var(--border-color);
             }
             
             .table-container {
@@ -671,199 +1268,252 @@ app.index_string = '''
 '''
 
 # Callbacks
-@app.callback(
-    Output("main-container", "className"),
-    [Input("dark-toggle", "n_clicks")]
+# Theme, map style buttons and reset only change UI state, so they run in the
+# browser and never take a worker slot; the reset defaults ship with the page
+clientside_callback(
+    """
+    function (n) {
+        return n % 2 === 1 ? "dark-mode" : "light-mode";
+    }
+    """,
+    "main-container.className",
+    ["dark-toggle.n_clicks"]
 )
-def toggle_dark_mode(n):
-    return "dark-mode" if n % 2 == 1 else "light-mode"
-
-@app.callback(
-    [Output("region-filter", "value"),
-     Output("ownership-filter", "value"),
-     Output("year-slider", "value")],
-    [Input("reset-filters", "n_clicks")],
+
+clientside_callback(
+    """
+    function (n, defaults) {
+        if (!n) {
+            return window.dash_clientside.no_update;
+        }
+        return [null, null, defaults.years, null, null, null];
+    }
+    """,
+    ["region-filter.value",
+     "ownership-filter.value",
+     "year-slider.value",
+     "near-lat.value",
+     "near-lon.value",
+     "near-radius.value"],
+    ["reset-filters.n_clicks"],
+    ["reset-defaults.data"],
     prevent_initial_call=True
 )
-def reset_filters(n):
-    if n is None:
-        raise PreventUpdate
-    return None, None, [int(df["SS_FisYearName"].min()), int(df["SS_FisYearName"].max())]
-
-@app.callback(
-    Output("map-type-store", "children"),
-    [Input("satellite-btn", "n_clicks"),
-     Input("dark-btn", "n_clicks"),
-     Input("light-btn", "n_clicks")],
-    [dash.dependencies.State("map-type-store", "children")]
+
+clientside_callback(
+    """
+    function (satClicks, darkClicks, lightClicks, currentType) {
+        var triggered = window.dash_clientside.callback_context.triggered;
+        var styles = {"satellite-btn": "satellite", "dark-btn": "dark", "light-btn": "light"};
+        if (!triggered.length) {
+            return currentType;
+        }
+        return styles[triggered[0].prop_id.split(".")[0]] || currentType;
+    }
+    """,
+    "map-type-store.children",
+    ["satellite-btn.n_clicks",
+     "dark-btn.n_clicks",
+     "light-btn.n_clicks"],
+    ["map-type-store.children"]
 )
-def update_map_type(sat_clicks, dark_clicks, light_clicks, current_type):
-    ctx = dash.callback_context
-    if not ctx.triggered:
-        return current_type
-    
-    button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-    
-    if button_id == "satellite-btn":
-        return "satellite"
-    elif button_id == "dark-btn":
-        return "dark"
-    elif button_id == "light-btn":
-        return "light"
-    
-    return current_type
 
-@app.callback(
-    [Output("satellite-btn", "className"),
-     Output("dark-btn", "className"),
-     Output("light-btn", "className")],
-    [Input("map-type-store", "children")]
+clientside_callback(
+    """
+    function (mapType) {
+        return ["satellite", "dark", "light"].map(function (style) {
+            return style === mapType ? "map-toggle-btn active" : "map-toggle-btn";
+        });
+    }
+    """,
+    ["satellite-btn.className",
+     "dark-btn.className",
+     "light-btn.className"],
+    ["map-type-store.children"]
 )
-def update_active_button(map_type):
-    base_class = "map-toggle-btn"
-    active_class = "map-toggle-btn active"
-    
-    satellite_class = active_class if map_type == "satellite" else base_class
-    dark_class = active_class if map_type == "dark" else base_class
-    light_class = active_class if map_type == "light" else base_class
-    
-    return satellite_class, dark_class, light_class
-
-@app.callback(
-    Output("filtered-data-store", "data"),
-    [Input("apply-filters", "n_clicks")],
-    [dash.dependencies.State("region-filter", "value"),
-     dash.dependencies.State("ownership-filter", "value"),
-     dash.dependencies.State("year-slider", "value")]
+
+clientside_callback(
+    """
+    function (data, csv, parquet) {
+        var query = [];
+        if (data) {
+            var f = data.filters;
+            f.regions.forEach(function (v) { query.push("region=" + encodeURIComponent(v)); });
+            f.ownerships.forEach(function (v) { query.push("ownership=" + encodeURIComponent(v)); });
+            ["years", "near", "bbox"].forEach(function (k) {
+                if (f[k] && f[k].length) { query.push(k + "=" + f[k].join(",")); }
+            });
+        }
+        var suffix = query.length ? "?" + query.join("&") : "";
+        return [csv.split("?")[0] + suffix, parquet.split("?")[0] + suffix];
+    }
+    """,
+    ["download-csv.href",
+     "download-parquet.href"],
+    ["filtered-data-store.data"],
+    ["download-csv.href",
+     "download-parquet.href"]
 )
-def update_filtered_data(n_clicks, regions, ownerships, years):
-    if n_clicks is None:
-        raise PreventUpdate
-    
-    dff = df.copy()
-    
-    if regions:
-        dff = dff[dff["Region"].isin(regions)]
-    if ownerships:
-        dff = dff[dff["Substation Ownership"].isin(ownerships)]
-    
-    if years:
-        dff = dff[(dff["SS_FisYearName"] >= years[0]) & (dff["SS_FisYearName"] <= years[1])]
-    
-    return dff.to_json(date_format='iso', orient='split')
-
-@app.callback(
-    [Output("spend-trend-chart", "figure"),
-     Output("ownership-pie-chart", "figure"),
-     Output("map", "srcDoc"),
-     Output("substation-table", "data")],
-    [Input("filtered-data-store", "data"),
-     Input("map-type-store", "children")]
+
+@callback(
+    "filtered-data-store.data",
+    ["apply-filters.n_clicks"],
+    ["region-filter.value",
+     "ownership-filter.value",
+     "year-slider.value",
+     "near-lat.value",
+     "near-lon.value",
+     "near-radius.value"]
 )
-def update_visualizations(data, map_type):
-    if data is None:
-        raise PreventUpdate
-    
-    dff = pd.read_json(data, orient='split')
-    
-    # Spend Trend Chart
-    trend_fig = px.line(
-        dff.groupby("SS_FisYearName")[["Planning Plant", "Maintenence Plant"]].mean().reset_index(),
-        x="SS_FisYearName",
-        y=["Planning Plant", "Maintenence Plant"],
-        title="Spend Trend Analysis",
-        labels={"value": "Average Spend", "SS_FisYearName": "Fiscal Year"},
-        color_discrete_sequence=["#4361ee", "#f72585"]
-    )
+def update_filtered_data(n_clicks, regions, ownerships, years, near_lat, near_lon, near_radius):
+    prevent_update_if_none(n_clicks)
     
-    trend_fig.update_layout(
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font_color="var(--text-color)",
-        hovermode="x unified",
-        legend_title_text="Plant Type"
-    )
-    
-    # Ownership Pie Chart
-    ownership_counts = dff["Substation Ownership"].value_counts().reset_index()
-    ownership_counts.columns = ["Ownership", "Count"]
-    
-    pie_fig = px.pie(
-        ownership_counts,
-        values="Count",
-        names="Ownership",
-        title="Ownership Distribution",
-        hole=0.4,
-        color_discrete_sequence=px.colors.sequential.Blues_r
-    )
-    
-    pie_fig.update_layout(
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font_color="var(--text-color)",
-        showlegend=True
-    )
-    
-    pie_fig.update_traces(
-        textposition='inside',
-        textinfo='percent+label',
-        marker=dict(line=dict(color='var(--bg-color)', width=1))
-    )
-    
-    # Map
-    dff_map = dff.dropna(subset=["Latitude", "Longitude"])
-    
-    if map_type == "satellite":
-        tiles = "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}"
-        attr = "Tiles &copy; Esri &mdash; Source: Esri, i-cubed, USDA, USGS, AEX, GeoEye, Getmapping, Aerogrid, IGN, IGP, UPR-EGP, and the GIS User Community"
-        map_style = "white"
-    elif map_type == "dark":
-        tiles = "CartoDB dark_matter"
-        attr = ""
-        map_style = "dark"
-    else:
-        tiles = "OpenStreetMap"
-        attr = ""
-        map_style = "light"
+    filters = normalize_filters(regions, ownerships, years, [near_lat, near_lon, near_radius])
+    store = {"key": filter_key(filters), "filters": filters}
+    get_rows(current_snapshot(), store)
     
-    m = folium.Map(
-        location=[dff_map["Latitude"].mean(), dff_map["Longitude"].mean()],
-        zoom_start=5,
-        tiles=tiles,
-        attr=attr
-    )
-    
-    # Use a single color for all markers
-    for _, row in dff_map.iterrows():
-        folium.Marker(
-            location=[row["Latitude"], row["Longitude"]],
-            popup=f"""
-                <b>{row['Substation Name']}</b><br>
-                <table style="width:100%">
-                    <tr><td>Region:</td><td>{row.get('Region', 'N/A')}</td></tr>
-                    <tr><td>Ownership:</td><td>{row.get('Substation Ownership', 'N/A')}</td></tr>
-                    <tr><td>Year:</td><td>{row.get('SS_FisYearName', 'N/A')}</td></tr>
-                </table>
-            """,
-            icon=folium.Icon(color="lightblue", icon="bolt", prefix="fa")
-        ).add_to(m)
-
-    # Draw red lines connecting substations
-    dff_sorted = dff_map.sort_values(by=["Region", "Substation Name"])
-    coords = list(zip(dff_sorted["Latitude"], dff_sorted["Longitude"]))
-    for i in range(len(coords) - 1):
-        folium.PolyLine(
-            locations=[coords[i], coords[i + 1]],
-            color="red",
-            weight=2,
-            opacity=0.7
-        ).add_to(m)
+    return store
+
+# Each output has its own callback so a map style switch only touches the
+# map, and the charts and table are not held back by the map build
+@callback(
+    "spend-trend-chart.figure",
+    ["filtered-data-store.data"]
+)
+def update_trend_chart(data):
+    from substation_figures import trend_patch
+
+    summary = get_summary(current_snapshot(), checked_store(data))
+    with metrics.stage("figure"):
+        patch = trend_patch(summary)
+    return patch_output("spend-trend-chart.figure", patch)
+
+@callback(
+    "ownership-pie-chart.figure",
+    ["filtered-data-store.data"]
+)
+def update_ownership_chart(data):
+    from substation_figures import pie_patch
+
+    summary = get_summary(current_snapshot(), checked_store(data))
+    with metrics.stage("figure"):
+        patch = pie_patch(summary)
+    return patch_output("ownership-pie-chart.figure", patch)
+
+@callback(
+    ["total-substations-value.children",
+     "regions-covered-value.children",
+     "avg-spend-value.children"],
+    ["filtered-data-store.data"]
+)
+def update_metrics(data):
+    return format_metrics(get_summary(current_snapshot(), checked_store(data)))
+
+# A cached map (a style switch, or a filter seen before) is answered at once;
+# otherwise the request goes to build_map, which renders in the background
+@callback(
+    ["map.srcDoc",
+     "map-request.data"],
+    ["filtered-data-store.data",
+     "map-type-store.children"],
+    ["map-building.data"]
+)
+def update_map(data, map_type, building):
+    from dash import no_update
+
+    store = checked_store(data)
+    map_type = checked_map_type(map_type)
+    snap = current_snapshot()
+    with metrics.stage("map"):
+        html = cached_map_html(snap, store, map_type)
+    if html is None:
+        return no_update, {**store, "map_type": map_type, "version": snap.version}
+    # A build still running for an earlier filter would overwrite this map
+    # when it finishes; restarting build_map cancels it
+    return html, None if building else no_update
+
+@callback(
+    "map.srcDoc",
+    ["map-request.data"],
+    background=True,
+    allow_duplicate=True,
+    prevent_initial_call=True,
+    interval=MAP_POLL_MS,
+    progress=["map-status.children"],
+    progress_default=[""],
+    running=[("map-building.data", True, False),
+             ("map.className", "map-iframe map-iframe-stale", "map-iframe")]
+)
+def build_map(set_progress, request):
+    store = checked_store(request)
+    map_type = checked_map_type(request.get("map_type"))
+
+    # The snapshot version in the request only keys the job's result: a
+    # reload since then is rendered from the current snapshot
+    return get_map_html(current_snapshot(), store, map_type, progress=set_progress)
+
+# The table is paged, sorted and filtered on the server; only the visible page is sent
+@callback(
+    ["substation-table.data",
+     "substation-table.page_count"],
+    ["filtered-data-store.data",
+     "substation-table.page_current",
+     "substation-table.page_size",
+     "substation-table.sort_by",
+     "substation-table.filter_query"]
+)
+def update_table(data, page_current, page_size, sort_by, filter_query):
+    snap = current_snapshot()
+    rows = get_rows(snap, checked_store(data))
+    with metrics.stage("table"):
+        page_rows, page_count = snap.table_index.page(rows, page_current, page_size, sort_by, filter_query)
+        return snap.table_index.records(page_rows), page_count
+
+
+def create_app():
+    """Build the Dash app: its server hooks and routes, layout and callbacks.
+
+    Dash is imported here and folium and plotly with the first map and chart;
+    the dataset loads with the first request that needs it.
+    """
+    import dash
+
+    app = dash.Dash(__name__, suppress_callback_exceptions=True, background_callback_manager=job_manager())
+    app.title = "⚡ Substation Intelligence Platform"
+    server = app.server
+    metrics.instrument(server)
+    # Registered after the metrics hooks, so it runs first and they see both sizes
+    compress_responses(server, stage=metrics.stage)
+
+    server.add_url_rule("/metrics", view_func=prometheus_metrics)
+    server.add_url_rule("/api/map/viewport", view_func=map_viewport)
+    server.add_url_rule("/api/cache-stats", view_func=cache_stats)
+    server.add_url_rule("/api/worker-memory", view_func=worker_memory)
+    server.add_url_rule("/api/substations", view_func=query_substations)
+    server.add_url_rule("/api/summary", view_func=query_summary)
+    server.add_url_rule("/api/substations.<fmt>", view_func=export_substations)
+
+    for url in STYLESHEETS:
+        app.css.append_css({"external_url": url})
+    app.index_string = INDEX_STRING
+    app.layout = serve_layout
+    register_callbacks(app)
+    return app
+
+
+@functools.lru_cache(maxsize=None)
+def default_app():
+    return create_app()
+
+
+def __getattr__(name):
+    # WSGI entry point: gunicorn -c gunicorn.conf.py (or --preload Substation_main:server)
+    if name == "app":
+        return default_app()
+    if name == "server":
+        return default_app().server
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-    
-    # Table data
-    table_data = dff[["Substation Name", "Region", "Substation Ownership", "SS_FisYearName"]].to_dict('records')
-    
-    return trend_fig, pie_fig, m._repr_html_(), table_data
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=os.environ.get("SUBSTATION_DEBUG", "0") == "1")
\ No newline at end of file
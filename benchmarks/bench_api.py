@@ -0,0 +1,78 @@
+"""Cost of a poll against the JSON query API: full response vs 304 Not Modified.
+
+    python benchmarks/bench_api.py [--sizes 10000 100000 1000000] [--repeat 50]
+
+A scraper polls /api/substations (a 1000-row page) and /api/summary for a
+few filters. Without a validator every poll filters (from the result cache
+after the first), serializes and compresses its response; with the ETag of
+the previous response in If-None-Match an unchanged result is answered with
+an empty 304 before any of that runs. Times are medians per request through
+the Flask test client.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORK_DIR = tempfile.mkdtemp(prefix="substation-bench-")
+os.environ["SUBSTATION_CACHE_DIR"] = os.path.join(WORK_DIR, "cache")
+os.environ["SUBSTATION_RELOAD_INTERVAL"] = "0"
+warnings.simplefilter("ignore")
+
+import Substation_main as app  # noqa: E402
+from benchmarks.synthetic import generate_raw  # noqa: E402
+from substation_data import clean_frame  # noqa: E402
+from substation_snapshot import Snapshot  # noqa: E402
+
+QUERIES = {
+    "rows: everything": "/api/substations",
+    "rows: 3 regions, 2000-2015": "/api/substations?region=SR2&region=ER1&region=WR1&years=2000,2015",
+    "rows: bbox": "/api/substations?bbox=18,72,24,80",
+    "summary: everything": "/api/summary",
+    "summary: 3 regions, 2000-2015": "/api/summary?region=SR2&region=ER1&region=WR1&years=2000,2015",
+    "summary: bbox": "/api/summary?bbox=18,72,24,80",
+}
+
+
+def median_ms(client, url, repeat, headers):
+    times, size = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        times.append(time.perf_counter() - start)
+        size = len(response.data)
+    return statistics.median(times) * 1000, response.status_code, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    try:
+        client = app.create_app().server.test_client()
+        print(f"{'rows':>9}  {'query':<30}{'full ms':>9}{'KB':>8}{'304 ms':>9}{'KB':>6}")
+        for n in args.sizes:
+            snap = Snapshot(clean_frame(generate_raw(n)), f"bench-{n}")
+            app.snapshots.current = snap
+            app.shared_cache = app.open_shared_cache(snap)
+            for label, url in QUERIES.items():
+                headers = {"Accept-Encoding": "gzip, br"}
+                tag = client.get(url, headers=headers).headers["ETag"]
+                full, _, full_size = median_ms(client, url, args.repeat, headers)
+                cond, status, cond_size = median_ms(client, url, args.repeat, {**headers, "If-None-Match": tag})
+                assert status == 304, status
+                print(f"{n:>9,}  {label:<30}{full:>9.2f}{full_size / 1024:>8.1f}{cond:>9.2f}{cond_size / 1024:>6.1f}")
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
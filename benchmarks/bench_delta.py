@@ -0,0 +1,65 @@
+"""Time applying a small delta: full rebuild of the snapshot vs Snapshot.apply_delta.
+
+    python benchmarks/bench_delta.py [--sizes 100000 500000] [--delta 50]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import REGIONS, generate_raw  # noqa: E402
+from substation_data import clean_frame  # noqa: E402
+from substation_delta import clean_delta, merge_delta  # noqa: E402
+from substation_snapshot import Snapshot  # noqa: E402
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def make_delta(df, n, seed=1):
+    """Half updates of existing substations (region, spend, coordinates), half new ones."""
+    rng = np.random.default_rng(seed)
+    updates = df.sample(n - n // 2, random_state=seed)[["Substation Name"]].assign(
+        Region=rng.choice(REGIONS, size=n - n // 2),
+        **{"Planning Plant": rng.gamma(2.0, 900.0, size=n - n // 2).round()},
+        Latitude=rng.uniform(8.0, 34.0, size=n - n // 2),
+        Longitude=rng.uniform(68.0, 97.0, size=n - n // 2),
+        SS_FisYearName=rng.integers(30682, 45657, size=n - n // 2).astype(float),
+    )
+    added = generate_raw(n // 2, seed=seed).rename(columns={"Longitudes": "Longitude"})
+    added["Substation Name"] = "NEW-" + added["Substation Name"]
+    return clean_delta(pd.concat([updates, added], ignore_index=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 500_000])
+    parser.add_argument("--delta", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9}  {'case':<28}{'ms':>10}")
+    for n in args.sizes:
+        snapshot = Snapshot(clean_frame(generate_raw(n)), "base")
+        delta = make_delta(snapshot.df, args.delta)
+        names = snapshot.table_index.columns["Substation Name"]
+        merged, _ = merge_delta(snapshot.df, delta, names)
+
+        cases = {
+            "full rebuild": lambda: Snapshot(merged, "full"),
+            f"apply_delta ({len(delta)} rows)": lambda: snapshot.apply_delta(delta, "delta.csv", "sha"),
+        }
+        for label, fn in cases.items():
+            ms, _ = timed(fn)
+            print(f"{n:>9,}  {label:<28}{ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Peak memory and time of a filtered-table download: one whole file vs streamed chunks.
+
+    python benchmarks/bench_download.py [--sizes 100 10000 100000 1000000] [--chunk-rows 20000]
+
+The whole-file case is what a dcc.Download callback would do: take every
+filtered row and write the file in one piece before sending it. The streamed
+case is /api/substations.csv (and .parquet when pyarrow is installed), which
+writes --chunk-rows rows at a time and drops each piece once sent. Peak is
+the most memory traced (tracemalloc) above what the dataset already holds,
+measured in a second run so tracing does not distort the time.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_raw  # noqa: E402
+from substation_data import clean_frame  # noqa: E402
+from substation_download import PARQUET, csv_chunks, parquet_chunks  # noqa: E402
+from substation_index import FilterIndex  # noqa: E402
+
+
+def whole_csv(df, rows, columns, chunk_rows):
+    yield df.take(rows)[columns].to_csv(index=False)
+
+
+def whole_parquet(df, rows, columns, chunk_rows):
+    buffer = io.BytesIO()
+    df.take(rows)[columns].to_parquet(buffer, index=False)
+    yield buffer.getvalue()
+
+
+def consume(write, df, rows, chunk_rows):
+    """Send every piece nowhere; returns the bytes written."""
+    return sum(len(piece) for piece in write(df, rows, list(df.columns), chunk_rows))
+
+
+def measure(write, df, rows, chunk_rows):
+    start = time.perf_counter()
+    size = consume(write, df, rows, chunk_rows)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    consume(write, df, rows, chunk_rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--chunk-rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    cases = {"csv, whole file": whole_csv, "csv, streamed": csv_chunks}
+    if PARQUET:
+        cases.update({"parquet, whole file": whole_parquet, "parquet, streamed": parquet_chunks})
+
+    print(f"{'rows':>10}  {'case':<22}{'s':>8}{'peak MB':>10}{'file MB':>10}")
+    for n in args.sizes:
+        df = clean_frame(generate_raw(n))
+        rows = FilterIndex(df).rows()
+        for label, write in cases.items():
+            elapsed, peak, size = measure(write, df, rows, args.chunk_rows)
+            print(f"{n:>10,}  {label:<22}{elapsed:>8.2f}{peak / 2**20:>10.1f}{size / 2**20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Reports per second from substation_export on a synthetic register.
+
+    python benchmarks/bench_export.py [--rows 50000] [--workers 1 2 4]
+
+Writes the per-region, per-ownership report matrix for each --workers count,
+first with empty caches (every map and network rendered) and then again with
+the map layers and network lines already in the shared disk cache, as a
+second monthly run over an unchanged dataset would find them. Parallel runs
+only pay off with as many free cores as workers.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORK_DIR = tempfile.mkdtemp(prefix="substation-bench-")
+os.environ["SUBSTATION_CACHE_DIR"] = os.path.join(WORK_DIR, "cache")
+os.environ["SUBSTATION_RELOAD_INTERVAL"] = "0"
+warnings.simplefilter("ignore")
+
+import Substation_main as app  # noqa: E402
+import substation_export as export  # noqa: E402
+from benchmarks.synthetic import generate_raw  # noqa: E402
+from substation_data import clean_frame  # noqa: E402
+from substation_snapshot import Snapshot  # noqa: E402
+
+
+def clear_caches():
+    for cache in app.VERSIONED_CACHES:
+        cache.clear()
+    app.shared_cache.clear()
+
+
+def run(matrix, workers):
+    out_dir = tempfile.mkdtemp(dir=WORK_DIR)
+    start = time.perf_counter()
+    written = sum(1 for _, _, rows, _ in export.export_reports(matrix, out_dir, workers=workers) if rows)
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(out_dir)
+    return written, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    try:
+        snap = Snapshot(clean_frame(generate_raw(args.rows)), f"bench-{args.rows}")
+        app.snapshots.current = snap
+        app.shared_cache = app.open_shared_cache(snap)
+        matrix = export.report_matrix(snap)
+
+        print(f"{args.rows:,} rows, {len(matrix)} combinations, {os.cpu_count()} CPU(s)")
+        print(f"{'workers':>8}{'reports':>9}{'cold s':>9}{'reports/s':>11}{'warm s':>9}{'reports/s':>11}")
+        for workers in args.workers:
+            clear_caches()
+            written, cold = run(matrix, workers)
+            _, warm = run(matrix, workers)
+            print(f"{workers:>8}{written:>9}{cold:>9.2f}{written / cold:>11.2f}{warm:>9.2f}{written / warm:>11.2f}")
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Time the dashboard filter: full-scan pandas vs the load-time FilterIndex.
+
+    python benchmarks/bench_filter.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_frame  # noqa: E402
+from substation_index import FilterIndex  # noqa: E402
+
+CASES = {
+    "one region, 5 years": dict(regions=["SR2"], ownerships=None, years=[2010, 2014]),
+    "rare ownership": dict(regions=None, ownerships=["PBGTL"], years=None),
+    "3 regions, 2 owners": dict(regions=["ER1", "NR2", "WR1"], ownerships=["POWERGRID", "TBCB"], years=[1990, 2020]),
+}
+
+
+def scan(df, regions=None, ownerships=None, years=None):
+    dff = df.copy()
+    if regions:
+        dff = dff[dff["Region"].isin(regions)]
+    if ownerships:
+        dff = dff[dff["Substation Ownership"].isin(ownerships)]
+    if years:
+        dff = dff[(dff["SS_FisYearName"] >= years[0]) & (dff["SS_FisYearName"] <= years[1])]
+    return dff
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'case':<22}{'matches':>9}{'scan ms':>10}{'positions ms':>14}{'frame ms':>10}")
+    for n in args.sizes:
+        df = generate_frame(n)
+        start = time.perf_counter()
+        index = FilterIndex(df)
+        build = (time.perf_counter() - start) * 1000
+        for label, case in CASES.items():
+            matches = len(index.positions(**case))
+            assert matches == len(scan(df, **case))
+            scan_ms = best_of(lambda: scan(df, **case), args.repeat)
+            pos_ms = best_of(lambda: index.positions(**case), args.repeat)
+            frame_ms = best_of(lambda: index.frame(df, **case), args.repeat)
+            print(f"{n:>10,}  {label:<22}{matches:>9,}{scan_ms:>10.2f}{pos_ms:>14.3f}{frame_ms:>10.2f}")
+        print(f"{n:>10,}  {'index build':<22}{'':>9}{build:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
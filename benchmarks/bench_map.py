@@ -0,0 +1,67 @@
+"""Time the map marker layer and measure srcDoc size: per-row folium.Marker vs SubstationMarkers.
+
+    python benchmarks/bench_map.py [--sizes 1000 10000 100000] [--legacy-max 10000]
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import folium  # noqa: E402
+
+from benchmarks.synthetic import generate_frame  # noqa: E402
+from substation_map import SubstationMarkers, base_map  # noqa: E402
+
+
+def legacy_markers(m, dff_map):
+    for _, row in dff_map.iterrows():
+        folium.Marker(
+            location=[row["Latitude"], row["Longitude"]],
+            popup=f"""
+                <b>{row['Substation Name']}</b><br>
+                <table style="width:100%">
+                    <tr><td>Region:</td><td>{row.get('Region', 'N/A')}</td></tr>
+                    <tr><td>Ownership:</td><td>{row.get('Substation Ownership', 'N/A')}</td></tr>
+                    <tr><td>Year:</td><td>{row.get('SS_FisYearName', 'N/A')}</td></tr>
+                </table>
+            """,
+            icon=folium.Icon(color="lightblue", icon="bolt", prefix="fa")
+        ).add_to(m)
+
+
+def bulk_markers(m, dff_map):
+    SubstationMarkers(dff_map).add_to(m)
+
+
+def measure(add_layer, dff_map):
+    start = time.perf_counter()
+    m = base_map(dff_map, "light")
+    add_layer(m, dff_map)
+    html = m._repr_html_()
+    return (time.perf_counter() - start) * 1000, len(html.encode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--legacy-max", type=int, default=10_000,
+                        help="skip the per-row loop above this many points")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    print(f"{'points':>8}  {'engine':<18}{'render ms':>12}{'srcDoc KB':>12}")
+    for n in args.sizes:
+        dff_map = generate_frame(n).dropna(subset=["Latitude", "Longitude"])
+        engines = [("SubstationMarkers", bulk_markers)]
+        if n <= args.legacy_max:
+            engines.insert(0, ("folium.Marker loop", legacy_markers))
+        for label, add_layer in engines:
+            ms, size = measure(add_layer, dff_map)
+            print(f"{n:>8,}  {label:<18}{ms:>12.1f}{size / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Map rendering spent on a burst of Apply clicks: blocking callbacks vs cancellable jobs.
+
+    python benchmarks/bench_map_jobs.py [--rows 20000] [--clicks 5] [--gap-ms 50]
+
+A user clicks Apply --clicks times, --gap-ms apart, each time with a filter
+whose map is not cached. As a blocking callback every click renders its map
+in turn on the worker, although only the last one is ever shown. As a
+background job each click cancels the build it supersedes: a queued build
+never starts and a running one stops at its next stage. Reports the render
+time the worker spends, the builds completed and cancelled, and how long
+after the last click its map is ready.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORK_DIR = tempfile.mkdtemp(prefix="substation-bench-")
+os.environ["SUBSTATION_CACHE_DIR"] = os.path.join(WORK_DIR, "cache")
+os.environ["SUBSTATION_RELOAD_INTERVAL"] = "0"
+warnings.simplefilter("ignore")
+
+import Substation_main as app  # noqa: E402
+from benchmarks.synthetic import generate_raw  # noqa: E402
+from substation_cache import filter_key, normalize_filters  # noqa: E402
+from substation_data import clean_frame  # noqa: E402
+from substation_jobs import JobManager  # noqa: E402
+from substation_snapshot import Snapshot  # noqa: E402
+
+
+def clear_caches():
+    for cache in app.VERSIONED_CACHES:
+        cache.clear()
+    app.shared_cache.clear()
+
+
+def requests_for(snap, clicks):
+    """One map request per click, each for a different pair of regions."""
+    regions = snap.filter_index.region.values
+    requests = []
+    for i in range(clicks):
+        filters = normalize_filters(regions=[regions[(2 * i) % len(regions)], regions[(2 * i + 1) % len(regions)]])
+        requests.append({"key": filter_key(filters), "filters": filters, "map_type": "light"})
+    return requests
+
+
+def blocking(requests, gap):
+    """Render every request in order on one worker; (busy seconds, seconds from last click to its map)."""
+    clear_caches()
+    busy, finish = 0.0, 0.0
+    for i, request in enumerate(requests):
+        start = time.perf_counter()
+        app.build_map(app.no_progress, request)
+        elapsed = time.perf_counter() - start
+        busy += elapsed
+        finish = max(finish, i * gap) + elapsed
+    return busy, finish - (len(requests) - 1) * gap, len(requests), 0
+
+
+def background(requests, gap):
+    """Start a job per click, cancelling the previous one; same figures plus (completed, cancelled)."""
+    clear_caches()
+    outcomes = []
+    manager = JobManager(os.path.join(WORK_DIR, "jobs"), 256 * 2**20,
+                         on_finish=lambda name, seconds, outcome: outcomes.append((seconds, outcome)))
+    job_fn = manager.make_job_fn(app.build_map, progress=True)
+    job = None
+    start = time.perf_counter()
+    for i, request in enumerate(requests):
+        time.sleep(max(0.0, start + i * gap - time.perf_counter()))
+        manager.terminate_job(job)
+        key = f"bench-{time.perf_counter_ns()}"
+        job = manager.call_job_fn(key, job_fn, [request], {})
+    last_click = time.perf_counter()
+    while not manager.result_ready(key):
+        time.sleep(0.001)
+    ready = time.perf_counter() - last_click
+    while len(outcomes) < len(requests):
+        time.sleep(0.001)
+    busy = sum(seconds for seconds, _ in outcomes)
+    done = sum(outcome == "done" for _, outcome in outcomes)
+    return busy, ready, done, len(outcomes) - done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--clicks", type=int, default=5)
+    parser.add_argument("--gap-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    try:
+        snap = Snapshot(clean_frame(generate_raw(args.rows)), f"bench-{args.rows}")
+        app.snapshots.current = snap
+        app.shared_cache = app.open_shared_cache(snap)
+        requests = requests_for(snap, args.clicks)
+        # Warm the imports and the filter indexes' first use outside the timings
+        app.build_map(app.no_progress, requests[0])
+
+        print(f"{args.rows:,} rows, {args.clicks} clicks {args.gap_ms:.0f} ms apart")
+        print(f"{'':<12}{'render ms':>12}{'last map ms':>14}{'built':>8}{'cancelled':>11}")
+        for label, run in (("blocking", blocking), ("background", background)):
+            busy, ready, done, cancelled = run(requests, args.gap_ms / 1000)
+            print(f"{label:<12}{busy * 1000:>12.1f}{ready * 1000:>14.1f}{done:>8}{cancelled:>11}")
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Bytes per row of the substation frame: plain pandas types vs the compact ones.
+
+    python benchmarks/bench_memory.py [--sizes 100000 1000000]
+
+"before" is the cleaned frame with the types pandas infers (object strings,
+int64 years, float64 coordinates), "after" the frame clean_frame returns
+(categorical repetitive strings, int16 years, float32 coordinates). Object columns
+count 8 bytes per row for the pointer plus each distinct string object once,
+as they are held after loading from the columnar cache.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_raw  # noqa: E402
+from substation_data import clean_frame, read_cache, write_cache  # noqa: E402
+
+
+def loose(df):
+    """``df`` with the column types pandas infers for the workbook."""
+    columns = {}
+    for name in df.columns:
+        col = df[name]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            columns[name] = col.astype(object)
+        elif col.dtype.kind in "iu":
+            columns[name] = col.astype(np.int64)
+        elif col.dtype.kind == "f":
+            columns[name] = col.astype(np.float64)
+        else:
+            columns[name] = col
+    return pd.DataFrame(columns, index=df.index)
+
+
+def column_bytes(col):
+    """Bytes held by one column: its arrays plus each distinct string object once."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col.cat.codes.to_numpy().nbytes + column_bytes(pd.Series(col.cat.categories, dtype=object))
+    values = col.to_numpy()
+    if values.dtype != object:
+        return values.nbytes
+    distinct = {id(value): value for value in values}
+    return values.nbytes + sum(sys.getsizeof(value) for value in distinct.values())
+
+
+def per_row(df):
+    return pd.Series({name: column_bytes(df[name]) / len(df) for name in df.columns})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        compact = clean_frame(generate_raw(n))
+        # Through the columnar cache, as a worker holds the frame: equal
+        # strings share one object in both representations
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            write_cache(compact, snapshot_dir)
+            compact = read_cache(snapshot_dir, mmap_mode=None)
+        before, after = per_row(loose(compact)), per_row(compact)
+        print(f"\n{n:,} rows, bytes per row")
+        print(f"{'column':<24}{'before':>10}{'after':>10}  type")
+        for name in compact.columns:
+            print(f"{name:<24}{before[name]:>10.1f}{after[name]:>10.1f}  {compact[name].dtype.name}")
+        total_before, total_after = before.sum(), after.sum()
+        print(f"{'total':<24}{total_before:>10.1f}{total_after:>10.1f}  {total_before / total_after:.1f}x smaller")
+        print(f"{'rows per GiB':<24}{2**30 / total_before:>10,.0f}{2**30 / total_after:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
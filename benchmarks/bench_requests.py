@@ -0,0 +1,69 @@
+"""Count the server round trips each dashboard interaction causes.
+
+    python benchmarks/bench_requests.py
+
+Follows the app's callback graph from the property a click changes: every
+callback with a changed input fires, and its outputs change in turn. Server
+callbacks cost one HTTP request and a worker slot each; clientside ones run
+in the browser. Background callbacks (the map build, only started when the
+map is not cached) cost a request to start plus one per poll, and render on
+a job thread instead of holding the request.
+"""
+import os
+import sys
+import tempfile
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SUBSTATION_CACHE_DIR", tempfile.mkdtemp(prefix="substation-bench-"))
+os.environ["SUBSTATION_RELOAD_INTERVAL"] = "0"
+warnings.simplefilter("ignore")
+
+import Substation_main as app  # noqa: E402
+
+INTERACTIONS = {
+    "theme toggle": "dark-toggle.n_clicks",
+    "map style button": "satellite-btn.n_clicks",
+    "reset filters": "reset-filters.n_clicks",
+    "apply filters": "apply-filters.n_clicks",
+    "table page": "substation-table.page_current",
+}
+
+
+def outputs(callback):
+    output = callback["output"]
+    if output.startswith(".."):
+        return output[2:-2].split("...")
+    return [output]
+
+
+def fired(prop):
+    """(server, background, clientside) callback outputs fired, transitively, by a change to ``prop``."""
+    server, background, clientside = [], [], []
+    changed, seen = [prop], set()
+    while changed:
+        current = changed.pop(0)
+        for callback in app.app._callback_list:
+            inputs = {f"{i['id']}.{i['property']}" for i in callback["inputs"]}
+            if current not in inputs or callback["output"] in seen:
+                continue
+            seen.add(callback["output"])
+            if callback.get("clientside_function"):
+                clientside.append(callback["output"])
+            else:
+                (background if callback.get("background") else server).append(callback["output"])
+            changed.extend(outputs(callback))
+    return server, background, clientside
+
+
+def main():
+    print(f"{'interaction':<20}{'server':>8}{'background':>12}{'clientside':>12}  server callbacks")
+    for label, prop in INTERACTIONS.items():
+        server, background, clientside = fired(prop)
+        names = ", ".join(output.strip(".").split(".")[0] for output in server) or "-"
+        print(f"{label:<20}{len(server):>8}{len(background):>12}{len(clientside):>12}  {names}")
+
+
+if __name__ == "__main__":
+    main()
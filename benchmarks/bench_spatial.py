@@ -0,0 +1,70 @@
+"""Time radius, k-nearest and bbox queries: brute-force haversine vs SpatialIndex.
+
+    python benchmarks/bench_spatial.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_frame  # noqa: E402
+from substation_spatial import EARTH_RADIUS_KM, SpatialIndex  # noqa: E402
+
+POINT = (25.0, 83.0)
+
+
+def haversine_km(lat, lon, lat0, lon0):
+    p, p0 = np.radians(lat), np.radians(lat0)
+    a = np.sin((p - p0) / 2) ** 2 + np.cos(p) * np.cos(p0) * np.sin(np.radians(lon - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def best_of(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'query':<18}{'brute ms':>10}{'index ms':>10}{'hits':>8}")
+    for n in args.sizes:
+        df = generate_frame(n)
+        lat = df["Latitude"].to_numpy()
+        lon = df["Longitude"].to_numpy()
+        start = time.perf_counter()
+        index = SpatialIndex(df)
+        build = (time.perf_counter() - start) * 1000
+
+        cases = {
+            "radius 50 km": (
+                lambda: np.flatnonzero(haversine_km(lat, lon, *POINT) <= 50),
+                lambda: index.within_radius(*POINT, 50),
+            ),
+            "10 nearest": (
+                lambda: np.argsort(np.nan_to_num(haversine_km(lat, lon, *POINT), nan=np.inf))[:10],
+                lambda: index.nearest(*POINT, 10)[0],
+            ),
+            "bbox 1x1 deg": (
+                lambda: np.flatnonzero((lat >= 24.5) & (lat <= 25.5) & (lon >= 82.5) & (lon <= 83.5)),
+                lambda: index.within_bbox(24.5, 82.5, 25.5, 83.5),
+            ),
+        }
+        for label, (brute, indexed) in cases.items():
+            hits = len(indexed())
+            print(f"{n:>10,}  {label:<18}{best_of(brute):>10.2f}{best_of(indexed):>10.3f}{hits:>8,}")
+        print(f"{n:>10,}  {'index build':<18}{'':>10}{build:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
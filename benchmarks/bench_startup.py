@@ -0,0 +1,51 @@
+"""Compare workbook parsing against the columnar cache used at startup.
+
+    python benchmarks/bench_startup.py [--repeat N] [--source maindataset.xlsx]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import substation_data  # noqa: E402
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--source", default=substation_data.SOURCE_PATH)
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="substation-bench-")
+    try:
+        xlsx = best_of(lambda: substation_data.read_source(args.source), args.repeat)
+
+        start = time.perf_counter()
+        substation_data.load_dataset(args.source, cache_dir)
+        first = time.perf_counter() - start
+
+        cached = best_of(lambda: substation_data.load_dataset(args.source, cache_dir), args.repeat)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(f"{'xlsx parse + clean':<28}{xlsx * 1000:10.1f} ms")
+    print(f"{'first load (parse + write)':<28}{first * 1000:10.1f} ms")
+    print(f"{'cached load':<28}{cached * 1000:10.1f} ms")
+    print(f"{'speedup':<28}{xlsx / cached:10.1f} x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Time the substation table: all rows via to_dict('records') vs one server-side page.
+
+    python benchmarks/bench_table.py [--sizes 10000 100000 500000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_frame  # noqa: E402
+from substation_index import FilterIndex  # noqa: E402
+from substation_table import TABLE_COLUMNS, TableIndex  # noqa: E402
+
+NAME_DESC = [{"column_id": "Substation Name", "direction": "desc"}]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>9}  {'case':<34}{'ms':>10}{'payload KB':>12}")
+    for n in args.sizes:
+        df = generate_frame(n)
+        filter_index = FilterIndex(df)
+        table_index = TableIndex(df, filter_index)
+        everything = filter_index.rows()
+        subset = filter_index.rows(regions=["SR2", "ER1", "WR1"])
+        last_page = len(everything) // 10 - 1
+
+        cases = {
+            "all rows, to_dict('records')": lambda: df[TABLE_COLUMNS].to_dict("records"),
+            "page 0": lambda: table_index.records(table_index.page(everything, 0, 10)[0]),
+            "last page, name desc": lambda: table_index.records(
+                table_index.page(everything, last_page, 10, NAME_DESC)[0]),
+            "3 regions, name desc, page 500": lambda: table_index.records(
+                table_index.page(subset, 500, 10, NAME_DESC)[0]),
+            "3 regions, name contains 99": lambda: table_index.records(
+                table_index.page(subset, 0, 10, NAME_DESC, '{Substation Name} contains "99"')[0]),
+        }
+        for label, fn in cases.items():
+            ms, records = timed(fn)
+            size = len(json.dumps(records, default=int)) / 1024
+            print(f"{n:>9,}  {label:<34}{ms:>10.2f}{size:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
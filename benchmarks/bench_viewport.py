@@ -0,0 +1,46 @@
+"""Build the zoom-level ClusterIndex and measure per-viewport query time and payload.
+
+    python benchmarks/bench_viewport.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_frame  # noqa: E402
+from substation_clusters import ClusterIndex  # noqa: E402
+
+# (zoom, south, west, north, east): whole country down to a single town
+VIEWPORTS = [
+    (4, 5.0, 60.0, 38.0, 100.0),
+    (7, 22.0, 78.0, 27.0, 86.0),
+    (10, 24.8, 82.6, 25.4, 83.4),
+    (14, 25.00, 83.00, 25.05, 83.05),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'points':>10}  {'zoom':>4}{'query ms':>10}{'clusters':>10}{'points':>8}{'payload KB':>12}")
+    for n in args.sizes:
+        dff = generate_frame(n).dropna(subset=["Latitude", "Longitude"])
+        start = time.perf_counter()
+        index = ClusterIndex(dff["Latitude"].to_numpy(), dff["Longitude"].to_numpy(), range(len(dff)))
+        build = (time.perf_counter() - start) * 1000
+        for zoom, *bounds in VIEWPORTS:
+            start = time.perf_counter()
+            clusters, points, _ = index.query(zoom, *bounds)
+            ms = (time.perf_counter() - start) * 1000
+            payload = len(json.dumps({"clusters": clusters.round(6).tolist(), "points": points.round(6).tolist()}))
+            print(f"{n:>10,}  {zoom:>4}{ms:>10.2f}{len(clusters):>10,}{len(points):>8,}{payload / 1024:>12.1f}")
+        print(f"{n:>10,}  build {build:.0f} ms, {index.nbytes / 2**20:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
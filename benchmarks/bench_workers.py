@@ -0,0 +1,116 @@
+"""Per-worker memory with a preloaded, memory-mapped dataset vs loading in each worker.
+
+    python benchmarks/bench_workers.py [--rows 1000000] [--workers 4]
+
+Forks workers the way gunicorn does, runs a filter/summary/table workload in
+each, then reads every live worker's RSS, PSS and USS. Linux only.
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import OWNERSHIPS, REGIONS, generate_frame  # noqa: E402
+from substation_data import read_cache, write_cache  # noqa: E402
+from substation_index import FilterIndex, SpendCube  # noqa: E402
+from substation_memory import process_memory  # noqa: E402
+from substation_table import TableIndex  # noqa: E402
+
+
+def build(snapshot_dir):
+    df = read_cache(snapshot_dir)
+    index = FilterIndex(df)
+    return df, index, SpendCube(df, index), TableIndex(df, index)
+
+
+def workload(state, queries=50):
+    df, index, cube, table = state
+    rng = np.random.default_rng(os.getpid())
+    for _ in range(queries):
+        regions = list(rng.choice(REGIONS, size=2, replace=False))
+        ownerships = [str(rng.choice(OWNERSHIPS))]
+        years = [1990, int(rng.integers(2000, 2025))]
+        rows = index.rows(regions, ownerships, years)
+        cube.summary(regions, ownerships, years)
+        page, _ = table.page(rows, 0, 10, [{"column_id": "Substation Name", "direction": "asc"}])
+        table.records(page)
+
+
+def run(snapshot_dir, workers, preload):
+    state = build(snapshot_dir) if preload else None
+    if preload:
+        gc.collect()
+        gc.freeze()
+
+    pids = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            workload(state if preload else build(snapshot_dir))
+            os.write(write_fd, b"1")
+            signal.pause()
+            os._exit(0)
+        os.close(write_fd)
+        os.read(read_fd, 1)
+        os.close(read_fd)
+        pids.append(pid)
+
+    try:
+        # Measure with every worker alive so shared pages are split between them
+        return process_memory(), [process_memory(pid) for pid in pids]
+    finally:
+        for pid in pids:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+
+
+def in_child(fn, *args):
+    """Run fn in a fresh fork so each mode starts from the same clean master."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        with os.fdopen(write_fd, "w") as out:
+            json.dump(fn(*args), out)
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as result:
+        value = json.load(result)
+    os.waitpid(pid, 0)
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="substation-bench-")
+    try:
+        snapshot_dir = os.path.join(cache_dir, "snapshot")
+        in_child(lambda: write_cache(generate_frame(args.rows), snapshot_dir))
+
+        print(f"{args.rows:,} rows, {args.workers} workers (MB)")
+        print(f"{'mode':<22}{'worker RSS':>12}{'worker PSS':>12}{'worker USS':>12}{'total PSS':>12}")
+        for label, preload in [("load per worker", False), ("preload + mmap", True)]:
+            master, stats = in_child(run, snapshot_dir, args.workers, preload)
+            mean = {k: sum(s[k] for s in stats) / len(stats) / 2**20 for k in ("rss", "pss", "uss")}
+            total = (master["pss"] + sum(s["pss"] for s in stats)) / 2**20
+            print(f"{label:<22}{mean['rss']:>12.1f}{mean['pss']:>12.1f}{mean['uss']:>12.1f}{total:>12.1f}")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
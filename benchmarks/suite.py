@@ -0,0 +1,175 @@
+"""Time the dashboard's hot paths on synthetic registers and compare them with stored baselines.
+
+    python benchmarks/suite.py [--sizes 1000 10000 100000 1000000] [--repeat 3]
+    python benchmarks/suite.py --save            # record this run as the new baselines
+    python benchmarks/suite.py --threshold 0.5   # allowed slowdown before a case fails
+
+Covers startup (cleaning the raw rows, loading the columnar cache, indexing a
+snapshot), the filter callback, the charts and metric cards, the map document
+and table pages. "map: build_map" is the dashboard's map, which above
+VIEWPORT_THRESHOLD mapped substations is only the viewport stub; "map: all
+markers" renders every filtered marker and line, as a report export does.
+The callbacks are the real ones from Substation_main, run against a
+synthetic snapshot with every server-side cache cleared before each
+timing. Each case reports the best of --repeat runs and is compared with
+benchmarks/baselines.json; a case slower than its baseline by more than
+--threshold (and by at least --floor-ms) is a regression and the script exits
+with status 1. Baselines are only meaningful on the machine that recorded them.
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the suite's snapshots, shared caches and delta polling away from the real ones
+WORK_DIR = tempfile.mkdtemp(prefix="substation-suite-")
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+os.environ["SUBSTATION_CACHE_DIR"] = os.path.join(WORK_DIR, "cache")
+os.environ["SUBSTATION_DELTA_DIR"] = os.path.join(WORK_DIR, "deltas")
+os.environ["SUBSTATION_RELOAD_INTERVAL"] = "0"
+
+import Substation_main as app  # noqa: E402
+from benchmarks.synthetic import generate_raw  # noqa: E402
+from substation_data import clean_frame, read_cache, write_cache  # noqa: E402
+from substation_map import render_layers  # noqa: E402
+from substation_snapshot import Snapshot  # noqa: E402
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+FILTERS = dict(regions=["ER1", "SR2"], ownerships=None, years=[1995, 2020])
+NAME_DESC = [{"column_id": "Substation Name", "direction": "desc"}]
+
+
+def machine():
+    return {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system()}
+
+
+def install(snapshot):
+    """Serve ``snapshot`` from the app with every cache empty."""
+    app.default_app()
+    app.snapshots.current = snapshot
+    app.shared_cache = app.open_shared_cache(snapshot)
+    clear_caches()
+
+
+def clear_caches():
+    for cache in app.VERSIONED_CACHES:
+        cache.clear()
+    app.shared_cache.clear()
+
+
+def best_of(fn, repeat, setup=clear_caches):
+    timings = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def cases(n):
+    """(label, fn) pairs for one dataset size; the snapshot is installed on the way."""
+    raw = generate_raw(n)
+    df = clean_frame(raw)
+    snapshot_dir = os.path.join(WORK_DIR, f"bench-{n}")
+    write_cache(df, snapshot_dir)
+    install(Snapshot(df, f"bench-{n}"))
+
+    def update_filtered_data():
+        return app.update_filtered_data(1, FILTERS["regions"], FILTERS["ownerships"], FILTERS["years"],
+                                        None, None, None)
+
+    store = update_filtered_data()
+
+    def charts():
+        app.update_trend_chart(store)
+        app.update_ownership_chart(store)
+        app.update_metrics(store)
+
+    def all_markers():
+        snap = app.current_snapshot()
+        return render_layers(app.get_filtered(snap, store), app.get_segments(snap, store))
+
+    return [
+        ("startup: clean raw rows", lambda: clean_frame(raw)),
+        ("startup: cached load", lambda: read_cache(snapshot_dir)),
+        ("startup: index snapshot", lambda: Snapshot(df, f"bench-{n}")),
+        ("filter: update_filtered_data", update_filtered_data),
+        ("charts: trend, pie, metrics", charts),
+        ("map: build_map", lambda: app.build_map(app.no_progress, {**store, "map_type": "light"})),
+        ("map: all markers", all_markers),
+        ("table: first page", lambda: app.update_table(store, 0, 10, None, "")),
+        ("table: name desc, page 50", lambda: app.update_table(store, 50, 10, NAME_DESC, "")),
+    ]
+
+
+def load_baselines():
+    try:
+        with open(BASELINES, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="fractional slowdown over baseline reported as a regression")
+    parser.add_argument("--floor-ms", type=float, default=1.0,
+                        help="ignore slowdowns smaller than this, which are timer noise")
+    parser.add_argument("--save", action="store_true", help=f"write the results to {BASELINES}")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    baselines = load_baselines()
+    if baselines and baselines.get("machine") != machine():
+        print(f"baselines were recorded on {baselines.get('machine')}, this is {machine()}")
+    recorded = (baselines or {}).get("results", {})
+
+    results = {}
+    regressions = []
+    print(f"{'rows':>10}  {'case':<30}{'ms':>10}{'baseline':>10}{'change':>9}")
+    for n in args.sizes:
+        for label, fn in cases(n):
+            ms = best_of(fn, args.repeat)
+            results.setdefault(label, {})[str(n)] = round(ms, 3)
+            base = recorded.get(label, {}).get(str(n))
+            if base is None:
+                print(f"{n:>10,}  {label:<30}{ms:>10.2f}{'-':>10}{'':>9}")
+                continue
+            change = ms / base - 1 if base else 0.0
+            flag = ""
+            if change > args.threshold and ms - base > args.floor_ms:
+                flag = "  REGRESSION"
+                regressions.append((n, label, base, ms))
+            print(f"{n:>10,}  {label:<30}{ms:>10.2f}{base:>10.2f}{change:>+9.0%}{flag}")
+
+    if args.save:
+        # Sizes not run this time keep their old baselines
+        for label, sizes in recorded.items():
+            for n, ms in sizes.items():
+                results.setdefault(label, {}).setdefault(n, ms)
+        with open(BASELINES, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine(), "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baselines written to {BASELINES}")
+    elif regressions:
+        print(f"\n{len(regressions)} case(s) more than {args.threshold:.0%} slower than baseline:")
+        for n, label, base, ms in regressions:
+            print(f"  {n:>10,} rows  {label}: {base:.2f} -> {ms:.2f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
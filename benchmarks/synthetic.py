@@ -0,0 +1,56 @@
+"""Synthetic substation registers matching the maindataset.xlsx schema."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from substation_data import clean_frame  # noqa: E402
+
+REGIONS = ["ER1", "ER2", "NER", "NR1-G1", "NR1-G2", "NR2", "NR3", "ODISHA", "SR1", "SR2", "WR1", "WR2"]
+OWNERSHIPS = ["POWERGRID", "TBCB", "PBGTL"]
+OWNERSHIP_WEIGHTS = [0.92, 0.07, 0.01]
+
+# 1984-01-01 .. 2024-12-31 as Excel serial days
+SERIAL_RANGE = (30682, 45657)
+
+
+def generate_raw(n, seed=0):
+    """Rows shaped like the raw workbook (Excel serial years, ``Longitudes``)."""
+    rng = np.random.default_rng(seed)
+    region = rng.choice(REGIONS, size=n)
+    ownership = rng.choice(OWNERSHIPS, size=n, p=OWNERSHIP_WEIGHTS)
+    planning = rng.gamma(2.0, 900.0, size=n).round()
+    maintenance = planning + rng.integers(0, 30, size=n)
+    lat = rng.uniform(8.0, 34.0, size=n)
+    lon = rng.uniform(68.0, 97.0, size=n)
+    # The real register has a handful of rows without coordinates
+    lat[rng.random(n) < 0.01] = np.nan
+    ids = np.arange(1, n + 1)
+    names = pd.Series(ids).map("SS-{:07d}".format)
+    return pd.DataFrame({
+        "S.No": ids,
+        "Substation Name": names,
+        "Substation Description": names + " SS",
+        "Substation Code": pd.Series(region) + "-" + names.str[-5:],
+        "Region": region,
+        "Planning Plant": planning,
+        "Maintenence Plant": maintenance,
+        "Substation Ownership": ownership,
+        "Substation Voltage": rng.choice([220, 400, 765], size=n),
+        "Substation Type": rng.choice(["AIS", "GIS"], size=n),
+        "SS_FisYearName": rng.integers(*SERIAL_RANGE, size=n).astype(float),
+        "SS_AgeGroup": rng.choice(["0 - 10", "10 - 20", "20 - 30", "30 - 40"], size=n),
+        "Business": rng.choice(["RTM", "TBCB"], size=n),
+        "Latitude": lat,
+        "Longitudes": lon,
+        "SS_ChangedBy": np.full(n, 60003377.0),
+        "SS_ChangedOn": np.full(n, 45506.0),
+    })
+
+
+def generate_frame(n, seed=0):
+    """A cleaned frame, as returned by ``substation_data.load_dataset``."""
+    return clean_frame(generate_raw(n, seed))
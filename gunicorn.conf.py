@@ -0,0 +1,33 @@
+"""Production server settings: gunicorn -c gunicorn.conf.py"""
+import gc
+import os
+
+from substation_memory import process_memory
+
+wsgi_app = "Substation_main:server"
+bind = os.environ.get("SUBSTATION_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("SUBSTATION_WORKERS", "4"))
+threads = int(os.environ.get("SUBSTATION_THREADS", "1"))
+timeout = int(os.environ.get("SUBSTATION_TIMEOUT", "120"))
+
+# Load the dataset and build its indexes once in the master; forked workers
+# share those pages copy-on-write instead of each holding a parsed copy
+preload_app = True
+
+
+def when_ready(server):
+    # The app only loads its dataset and rendering libraries when first used;
+    # do it here, so every worker starts with them
+    from Substation_main import preload
+
+    preload()
+
+    # Move everything allocated so far out of the collector's reach, so its
+    # scans do not write to (and un-share) the preloaded objects' pages
+    gc.collect()
+    gc.freeze()
+    server.log.info("master ready: %s", process_memory())
+
+
+def post_worker_init(worker):
+    worker.log.info("worker %s memory: %s", worker.pid, process_memory())
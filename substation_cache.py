@@ -0,0 +1,279 @@
+import hashlib
+import json
+import math
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def _finite(value):
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"{value} is not a finite number")
+    return value
+
+
+def normalize_filters(regions=None, ownerships=None, years=None, near=None, bbox=None):
+    """Canonical form of the dashboard filters: sorted, de-duplicated, JSON-safe.
+
+    ``near`` is [lat, lon, radius_km] and is dropped unless all three are set;
+    ``bbox`` is [south, west, north, east] and is dropped unless all four are.
+    Values that do not parse, NaN and infinities raise ValueError or TypeError.
+    """
+    if near and len(near) == 3 and all(v is not None for v in near):
+        near = [_finite(v) for v in near]
+        near = [round(near[0], 6), round(near[1], 6), near[2]] if near[2] >= 0 else []
+    else:
+        near = []
+    if bbox and len(bbox) == 4 and all(v is not None for v in bbox):
+        bbox = [round(_finite(v), 6) for v in bbox]
+    else:
+        bbox = []
+    return {
+        "regions": sorted(set(regions)) if regions else [],
+        "ownerships": sorted(set(ownerships)) if ownerships else [],
+        "years": [int(years[0]), int(years[1])] if years else [],
+        "near": near,
+        "bbox": bbox,
+    }
+
+
+def filter_key(filters):
+    payload = json.dumps(filters, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def sizeof(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Thread-safe LRU cache bounded by an approximate byte budget."""
+
+    def __init__(self, max_bytes, sizer=sizeof):
+        self.max_bytes = max_bytes
+        self._sizer = sizer
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self._sizer(value)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                self.rejected += 1
+                return value
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+        return value
+
+    def get_or_build(self, key, build):
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, build())
+        return value
+
+    def discard(self, predicate, convert=None):
+        """Drop every entry whose key matches predicate; returns how many.
+
+        ``convert(key, value)`` may return a (key, value) pair to store in
+        place of a dropped entry, or None to let it go.
+        """
+        with self._lock:
+            stale = [(key, self._entries.pop(key)) for key in list(self._entries) if predicate(key)]
+            for _, (_, size) in stale:
+                self.bytes -= size
+        for key, (value, _) in stale if convert is not None else []:
+            converted = convert(key, value)
+            if converted is not None:
+                self.put(*converted)
+        return len(stale)
+
+    def items(self):
+        """(key, value) pairs, least recently used first."""
+        with self._lock:
+            return [(key, value) for key, (value, _) in self._entries.items()]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "rejected": self.rejected,
+            }
+
+
+class DiskCache:
+    """LRU cache in a directory, shared by every worker process that opens it.
+
+    Each entry is pickled to its own file and published with an atomic rename,
+    so readers never see a partial write. Reads refresh the file's mtime and
+    writes drop the least recently used files once the directory exceeds
+    ``max_bytes``. Hit/miss counters are per process.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    def _path(self, key):
+        name = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name + ".pkl")
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _files(self):
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return []
+        files = []
+        for entry in entries:
+            if entry.name.endswith(".pkl"):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files.append((st.st_mtime_ns, st.st_size, entry.path))
+        return files
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self._count("misses")
+            return None
+        self._count("hits")
+        return value
+
+    def put(self, key, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            self._count("rejected")
+            return value
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        except OSError:
+            return value
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return value
+        self._prune()
+        return value
+
+    def _prune(self):
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self._count("evictions")
+
+    def get_or_build(self, key, build):
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, build())
+        return value
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def adopt(self, source, keys):
+        """Hard-link entries of the DiskCache ``source`` in under new keys.
+
+        ``keys`` holds (source key, key) pairs; missing entries are skipped.
+        """
+        for old, new in keys:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                os.link(source._path(old), self._path(new))
+            except OSError:
+                continue
+
+    def clear(self):
+        for _, _, path in self._files():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        files = self._files()
+        with self._lock:
+            return {
+                "entries": len(files),
+                "bytes": sum(size for _, size, _ in files),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "rejected": self.rejected,
+            }
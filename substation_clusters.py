@@ -0,0 +1,108 @@
+import numpy as np
+
+MIN_ZOOM = 0
+MAX_ZOOM = 16
+CLUSTER_RADIUS_PX = 60
+TILE_EXTENT_PX = 256
+
+
+def mercator(lat, lon):
+    """Normalised Web Mercator coordinates in [0, 1]."""
+    x = (np.asarray(lon, dtype=float) + 180.0) / 360.0
+    sin = np.clip(np.sin(np.radians(np.asarray(lat, dtype=float))), -0.9999, 0.9999)
+    y = 0.5 - 0.25 * np.log((1 + sin) / (1 - sin)) / np.pi
+    return x, np.clip(y, 0.0, 1.0)
+
+
+def inverse_mercator(x, y):
+    lon = x * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y))))
+    return lat, lon
+
+
+class _Level:
+    def __init__(self, x, y, count, row):
+        self.x, self.y, self.count, self.row = x, y, count, row
+        self.lat, self.lon = inverse_mercator(x, y)
+        self.order = np.argsort(self.lon, kind="stable")
+        self.sorted_lon = self.lon[self.order]
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.x, self.y, self.count, self.row, self.lat, self.lon, self.order, self.sorted_lon))
+
+    def _lon_band(self, west, east):
+        lo = np.searchsorted(self.sorted_lon, west, side="left")
+        hi = np.searchsorted(self.sorted_lon, east, side="right")
+        return self.order[lo:hi]
+
+    def within(self, south, west, north, east):
+        if east - west >= 360:
+            band = self.order
+        else:
+            west = (west + 180.0) % 360.0 - 180.0
+            east = (east + 180.0) % 360.0 - 180.0
+            if west <= east:
+                band = self._lon_band(west, east)
+            else:
+                band = np.concatenate([self._lon_band(west, 180.0), self._lon_band(-180.0, east)])
+        lat = self.lat[band]
+        return band[(lat >= south) & (lat <= north)]
+
+
+class ClusterIndex:
+    """Supercluster-style grid clusters precomputed for every zoom level.
+
+    Level ``MAX_ZOOM + 1`` holds the individual substations; each coarser
+    level merges the previous one on a grid of CLUSTER_RADIUS_PX screen
+    pixels, keeping count-weighted centroids. A viewport query touches only
+    the requested level, so its cost and payload are bounded by how many
+    clusters fit on screen rather than by the number of substations.
+    """
+
+    def __init__(self, lat, lon, rows, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, radius=CLUSTER_RADIUS_PX):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        x, y = mercator(lat, lon)
+        level = _Level(x, y, np.ones(len(x), dtype=np.int64), np.asarray(rows, dtype=np.int64))
+        self.levels = {max_zoom + 1: level}
+        for zoom in range(max_zoom, min_zoom - 1, -1):
+            level = self._merge(level, radius / (TILE_EXTENT_PX * 2.0 ** zoom))
+            self.levels[zoom] = level
+
+    @staticmethod
+    def _merge(level, cell):
+        if not len(level.x):
+            return level
+        cells_per_axis = int(np.ceil(1.0 / cell)) + 1
+        keys = np.floor(level.x / cell).astype(np.int64) * cells_per_axis + np.floor(level.y / cell).astype(np.int64)
+        _, groups = np.unique(keys, return_inverse=True)
+        count = np.bincount(groups, weights=level.count).astype(np.int64)
+        x = np.bincount(groups, weights=level.x * level.count) / count
+        y = np.bincount(groups, weights=level.y * level.count) / count
+        row = np.full(len(count), -1, dtype=np.int64)
+        row[groups] = level.row
+        row[count > 1] = -1
+        return _Level(x, y, count, row)
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels.values())
+
+    def query(self, zoom, south, west, north, east, limit=2000):
+        """Clusters and single points in the viewport at ``zoom``.
+
+        Returns (clusters, rows, truncated): clusters as an (m, 3) array of
+        lat, lon, count; rows as an (p, 3) array of lat, lon, row position.
+        """
+        zoom = int(min(max(zoom, self.min_zoom), self.max_zoom + 1))
+        level = self.levels[zoom]
+        hits = level.within(south, west, north, east)
+        truncated = len(hits) > limit
+        if truncated:
+            # Keep the heaviest clusters so the overview stays representative
+            hits = hits[np.argsort(-level.count[hits], kind="stable")[:limit]]
+        single = level.row[hits] >= 0
+        clusters = np.column_stack((level.lat[hits[~single]], level.lon[hits[~single]], level.count[hits[~single]]))
+        points = np.column_stack((level.lat[hits[single]], level.lon[hits[single]], level.row[hits[single]]))
+        return clusters, points, truncated
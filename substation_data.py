@@ -0,0 +1,324 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_PATH = os.path.join(BASE_DIR, "maindataset.xlsx")
+CACHE_DIR = os.environ.get("SUBSTATION_CACHE_DIR", os.path.join(BASE_DIR, ".substation_cache"))
+
+# Bump when clean_frame changes so stale caches are not reused
+CACHE_FORMAT = 2
+
+# Taken by the one process writing (and pruning) snapshots in a cache dir
+SNAPSHOT_LOCK = "snapshot.lock"
+
+# In memory, fiscal years are int16 and coordinates float32 (well under a
+# metre of error); spend stays float64 so sums over millions of rows are exact
+COLUMN_DTYPES = {"SS_FisYearName": np.int16, "Latitude": np.float32, "Longitude": np.float32}
+
+# Leading rows checked before dictionary-encoding a string column
+CARDINALITY_SAMPLE = 10_000
+
+
+def clean_frame(raw):
+    """Apply the dashboard's cleaning rules to a freshly parsed workbook."""
+    df = raw.rename(columns={"Longitudes": "Longitude"})
+
+    df["Latitude"] = pd.to_numeric(df["Latitude"], errors='coerce')
+    df["Longitude"] = pd.to_numeric(df["Longitude"], errors='coerce')
+    df["SS_FisYearName"] = pd.to_datetime(df["SS_FisYearName"], errors='coerce', unit='D', origin='1899-12-30').dt.year
+    df = df.dropna(subset=["SS_FisYearName"])
+    df["SS_FisYearName"] = df["SS_FisYearName"].astype(int)
+    return compact_frame(df)
+
+
+def compact_frame(df):
+    """``df`` with compact column types.
+
+    Repetitive string columns become categoricals (small integer codes plus
+    one copy of each distinct value), other integer columns the narrowest type
+    that holds them, and the columns in COLUMN_DTYPES their listed type.
+    Near-unique strings (names, descriptions, codes) stay as they are: a
+    dictionary would only add a code per row.
+    """
+    df = df.copy(deep=False)
+    for name in df.columns:
+        col = df[name]
+        if name in COLUMN_DTYPES:
+            df[name] = col.astype(COLUMN_DTYPES[name])
+        elif col.dtype.kind in "iu":
+            df[name] = pd.to_numeric(col, downcast="integer" if col.dtype.kind == "i" else "unsigned")
+        elif col.dtype.kind not in "bfcmM" and not isinstance(col.dtype, pd.CategoricalDtype):
+            # Hashing a whole near-unique column is the slow part; a leading
+            # sample that is already mostly distinct rules it out
+            sample = col.iloc[:CARDINALITY_SAMPLE]
+            if len(sample) == CARDINALITY_SAMPLE and sample.nunique() * 2 > len(sample):
+                continue
+            codes, uniques = pd.factorize(col)
+            if len(uniques) * 2 <= len(col):
+                df[name] = pd.Categorical.from_codes(codes, uniques)
+    return df
+
+
+def read_source(path=SOURCE_PATH):
+    return clean_frame(pd.read_excel(path))
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_json(path, payload):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as fh:
+        json.dump(payload, fh)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def source_fingerprint(path=SOURCE_PATH, cache_dir=CACHE_DIR):
+    """Return the sha256 of the source, hashing only when mtime/size moved."""
+    st = os.stat(path)
+    stamp_path = os.path.join(cache_dir, "source.json")
+    stamp = _read_json(stamp_path)
+    if stamp and stamp.get("path") == os.path.abspath(path) \
+            and stamp.get("mtime_ns") == st.st_mtime_ns and stamp.get("size") == st.st_size:
+        return stamp["sha256"]
+
+    sha = _file_sha256(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_json(stamp_path, {
+        "path": os.path.abspath(path),
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "sha256": sha,
+    })
+    return sha
+
+
+def _snapshot_dir(cache_dir, sha):
+    return os.path.join(cache_dir, f"v{CACHE_FORMAT}-{sha[:20]}")
+
+
+def _acquire(lock, stale_after):
+    """Create ``lock``, taking over one older than ``stale_after`` seconds; False when another holds it."""
+    try:
+        if time.time() - os.stat(lock).st_mtime > stale_after:
+            os.remove(lock)
+    except OSError:
+        pass
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+    return True
+
+
+def _prune_snapshots(cache_dir, keep):
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith("v") and os.path.isdir(path) and path not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _to_native(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def write_cache(df, snapshot_dir):
+    """Write df as one .npy per column; string columns are dictionary-encoded.
+
+    Categorical columns keep their codes' dtype, so reading them back maps the
+    codes straight from the file. Snapshot directories are named by their
+    content and published once: if ``snapshot_dir`` already exists, it is left
+    as it is.
+    """
+    parent = os.path.dirname(snapshot_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    columns = []
+    try:
+        np.save(os.path.join(tmp_dir, "index.npy"), np.asarray(df.index))
+        for i, name in enumerate(df.columns):
+            col = df[name]
+            entry = {"name": name, "dtype": str(col.dtype), "file": f"c{i}.npy"}
+            if isinstance(col.dtype, pd.CategoricalDtype):
+                np.save(os.path.join(tmp_dir, entry["file"]), col.cat.codes.to_numpy())
+                entry["categories"] = [_to_native(v) for v in col.cat.categories]
+            elif col.dtype.kind in "biuf":
+                np.save(os.path.join(tmp_dir, entry["file"]), col.to_numpy())
+            else:
+                codes, uniques = pd.factorize(col)
+                np.save(os.path.join(tmp_dir, entry["file"]), codes.astype(np.int32))
+                entry["categories"] = [_to_native(v) for v in uniques]
+            columns.append(entry)
+        _write_json(os.path.join(tmp_dir, "meta.json"), {"format": CACHE_FORMAT, "columns": columns})
+        try:
+            os.replace(tmp_dir, snapshot_dir)
+        except OSError:
+            # Another process published it first; workers may still be mapping it
+            if not os.path.isdir(snapshot_dir):
+                raise
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def read_cache(snapshot_dir, mmap_mode="r"):
+    meta = _read_json(os.path.join(snapshot_dir, "meta.json"))
+    if not meta or meta.get("format") != CACHE_FORMAT:
+        return None
+
+    data = {}
+    for entry in meta["columns"]:
+        arr = np.load(os.path.join(snapshot_dir, entry["file"]), mmap_mode=mmap_mode)
+        if entry["dtype"] == "category":
+            # Codes stay memory-mapped like the numeric columns below
+            categories = pd.Index(entry["categories"])
+            data[entry["name"]] = pd.Series(pd.Categorical.from_codes(np.asarray(arr), categories), copy=False)
+        elif "categories" in entry:
+            values = np.empty(len(entry["categories"]) + 1, dtype=object)
+            values[:-1] = entry["categories"]
+            values[-1] = np.nan
+            # code -1 (missing) picks the trailing NaN slot
+            data[entry["name"]] = pd.Series(values.take(arr), dtype=entry["dtype"])
+        else:
+            # No copy: numeric columns stay backed by the OS page cache, which
+            # every worker process mapping this snapshot shares
+            data[entry["name"]] = pd.Series(np.asarray(arr), copy=False)
+    index = np.load(os.path.join(snapshot_dir, "index.npy"))
+    df = pd.DataFrame(data, copy=False)
+    df.index = pd.Index(index)
+    return df
+
+
+def load_versioned(path=SOURCE_PATH, cache_dir=CACHE_DIR, keep=(), stale_after=600, poll=0.1):
+    """Return (cleaned frame, source sha256), reparsing the workbook only when it changed.
+
+    Every worker notices a new workbook at the same time, so the lock file
+    ``write_compacted`` uses lets one of them parse it and write the snapshot
+    while the others wait and then map what it wrote. The writer prunes older
+    snapshots, except those of the versions in ``keep``.
+    """
+    try:
+        sha = source_fingerprint(path, cache_dir)
+    except OSError:
+        # Read-only deployments without a writable cache dir still work
+        return read_source(path), _file_sha256(path)
+
+    snapshot_dir = _snapshot_dir(cache_dir, sha)
+    lock = os.path.join(cache_dir, SNAPSHOT_LOCK)
+    while True:
+        df = read_cache(snapshot_dir)
+        if df is not None:
+            return df, sha
+        try:
+            if _acquire(lock, stale_after):
+                break
+        except OSError:
+            return read_source(path), sha
+        time.sleep(poll)
+
+    try:
+        # Whoever held the lock before may have written it already
+        cached = read_cache(snapshot_dir)
+        if cached is not None:
+            return cached, sha
+        df = read_source(path)
+        try:
+            write_cache(df, snapshot_dir)
+        except OSError:
+            return df, sha
+        _prune_snapshots(cache_dir, keep={snapshot_dir} | {_snapshot_dir(cache_dir, v) for v in keep})
+    finally:
+        os.remove(lock)
+    cached = read_cache(snapshot_dir)
+    return (df if cached is None else cached), sha
+
+
+def read_compacted(source, cache_dir=CACHE_DIR):
+    """(frame, version, deltas) of the compacted snapshot built on ``source``, or None.
+
+    ``deltas`` lists the (file name, sha256) pairs already folded into it.
+    """
+    manifest = _read_json(os.path.join(cache_dir, "compacted.json"))
+    if not manifest or manifest.get("format") != CACHE_FORMAT or manifest.get("source") != source:
+        return None
+    df = read_cache(_snapshot_dir(cache_dir, manifest["version"]))
+    if df is None:
+        return None
+    return df, manifest["version"], [tuple(d) for d in manifest["deltas"]]
+
+
+def write_compacted(df, version, source, deltas, cache_dir=CACHE_DIR, stale_after=600):
+    """Store df as the snapshot for ``version``, the source plus ``deltas`` folded in.
+
+    Workers apply the same deltas and would compact together, so a lock file
+    lets only one of them write. Returns False when another holds it.
+    """
+    lock = os.path.join(cache_dir, SNAPSHOT_LOCK)
+    if not _acquire(lock, stale_after):
+        return False
+
+    try:
+        manifest = _read_json(os.path.join(cache_dir, "compacted.json"))
+        if manifest and manifest.get("version") == version:
+            return True
+        snapshot_dir = _snapshot_dir(cache_dir, version)
+        write_cache(df, snapshot_dir)
+        _write_json(os.path.join(cache_dir, "compacted.json"), {
+            "format": CACHE_FORMAT,
+            "source": source,
+            "deltas": [list(d) for d in deltas],
+            "version": version,
+        })
+        _prune_snapshots(cache_dir, keep={snapshot_dir, _snapshot_dir(cache_dir, source)})
+    finally:
+        os.remove(lock)
+    return True
+
+
+def load_dataset(path=SOURCE_PATH, cache_dir=CACHE_DIR):
+    """Load the cleaned frame, reparsing the workbook only when it changed."""
+    return load_versioned(path, cache_dir)[0]
+
+
+def shared_dir(version, cache_dir=CACHE_DIR):
+    """Directory for caches shared by worker processes, one per snapshot version.
+
+    It sits beside the snapshot directories rather than inside them, so
+    rewriting or pruning a snapshot never touches it; ``prune_shared`` drops
+    the ones no longer needed.
+    """
+    return os.path.join(cache_dir, f"shared-{version[:20]}")
+
+
+def prune_shared(keep, cache_dir=CACHE_DIR):
+    """Remove the shared cache directories of every version not in ``keep``."""
+    keep = {shared_dir(version, cache_dir) for version in keep}
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(cache_dir, name)
+        if name.startswith("shared-") and os.path.isdir(path) and path not in keep:
+            shutil.rmtree(path, ignore_errors=True)
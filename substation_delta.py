@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from substation_data import BASE_DIR
+
+DELTA_DIR = os.environ.get("SUBSTATION_DELTA_DIR", os.path.join(BASE_DIR, "deltas"))
+DELTA_SUFFIXES = (".csv", ".xlsx", ".json")
+KEY = "Substation Name"
+
+
+def list_deltas(delta_dir=DELTA_DIR):
+    """Delta files in apply (file name) order as (name, mtime_ns, size) tuples."""
+    try:
+        entries = list(os.scandir(delta_dir))
+    except OSError:
+        return []
+    deltas = []
+    for entry in entries:
+        if entry.is_file() and entry.name.lower().endswith(DELTA_SUFFIXES) and not entry.name.startswith("."):
+            st = entry.stat()
+            deltas.append((entry.name, st.st_mtime_ns, st.st_size))
+    return sorted(deltas)
+
+
+def clean_delta(raw):
+    """Apply the workbook's cleaning rules to whichever columns a delta carries."""
+    df = raw.rename(columns={"Longitudes": "Longitude"})
+    if KEY not in df.columns:
+        raise ValueError(f"delta has no {KEY!r} column")
+    df = df.dropna(subset=[KEY])
+    df[KEY] = df[KEY].astype(str)
+    for column in ("Latitude", "Longitude"):
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+    if "SS_FisYearName" in df.columns:
+        years = pd.to_datetime(pd.to_numeric(df["SS_FisYearName"], errors="coerce"),
+                               errors="coerce", unit="D", origin="1899-12-30").dt.year
+        # Same rule as the workbook: rows without a fiscal year are not kept
+        df = df[years.notna()].assign(SS_FisYearName=years.dropna().astype(int))
+    return df.drop_duplicates(KEY, keep="last").reset_index(drop=True)
+
+
+def read_delta(path):
+    """Parse a CSV, xlsx or JSON (list of records) delta file into cleaned rows."""
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == ".csv":
+        raw = pd.read_csv(path)
+    elif suffix == ".xlsx":
+        raw = pd.read_excel(path)
+    elif suffix == ".json":
+        with open(path, encoding="utf-8") as f:
+            raw = pd.DataFrame(json.load(f))
+    else:
+        raise ValueError(f"unsupported delta file: {path}")
+    return clean_delta(raw)
+
+
+def delta_version(version, delta_sha):
+    """Version of a snapshot after applying a delta; the same in every worker."""
+    return hashlib.sha256(f"{version}:{delta_sha}".encode("ascii")).hexdigest()
+
+
+def merge_delta(df, delta, names):
+    """Upsert ``delta`` into ``df`` by Substation Name.
+
+    ``names`` is the frame's CategoryIndex over Substation Name. Returns the
+    merged frame and the changed row positions. Existing substations are
+    updated where they are (every row sharing the name) and new ones are
+    appended, so untouched rows keep their positions. Only the columns the
+    delta carries are overwritten; new rows need a fiscal year.
+    """
+    codes = names.codes_of(delta[KEY].to_numpy(dtype=object))
+    existing = codes < len(names.values)
+    codes = codes[existing].astype(np.int64)
+    counts = names.offsets[codes + 1] - names.offsets[codes]
+    updated = np.concatenate(
+        [names.order[names.offsets[c]:names.offsets[c + 1]] for c in codes]) if len(codes) else np.empty(0, np.intp)
+    source = np.repeat(np.flatnonzero(existing), counts)
+
+    appended = delta[~existing]
+    if "SS_FisYearName" not in delta.columns:
+        appended = appended.iloc[:0]
+
+    columns = [c for c in delta.columns if c in df.columns]
+    df = _with_categories(df, delta, columns)
+    if len(appended):
+        start = int(df.index.max()) + 1 if len(df) else 0
+        rows = pd.DataFrame({c: appended[c].to_numpy(dtype=object) for c in columns},
+                            columns=df.columns, index=pd.RangeIndex(start, start + len(appended)))
+        for column in df.columns:
+            try:
+                rows[column] = rows[column].astype(df[column].dtype)
+            except (TypeError, ValueError):
+                # Integer columns the delta leaves blank become float, as pandas would
+                rows[column] = pd.to_numeric(rows[column], errors="coerce")
+        merged = pd.concat([df, rows])
+    else:
+        # Shallow: only the columns written below get copied
+        merged = df.copy(deep=False)
+
+    for column in columns if len(updated) else []:
+        new = delta[column].to_numpy()[source]
+        target = merged[column].dtype
+        if target.kind == "f" or (target.kind in "iu" and new.dtype.kind in "iu"):
+            # Compact numeric columns keep their width (int16 years, float32 coordinates)
+            new = new.astype(target)
+        try:
+            merged.iloc[updated, merged.columns.get_loc(column)] = new
+        except TypeError:
+            if merged[column].dtype.kind not in "iu":
+                raise
+            merged[column] = merged[column].astype(float)
+            merged.iloc[updated, merged.columns.get_loc(column)] = new
+    positions = np.concatenate([updated, np.arange(len(df), len(merged))]).astype(np.intp)
+    return merged, np.unique(positions)
+
+
+def _with_categories(df, delta, columns):
+    """``df`` with every value ``delta`` writes into a categorical column added to its categories."""
+    for column in columns:
+        if not isinstance(df[column].dtype, pd.CategoricalDtype):
+            continue
+        values = pd.Index(delta[column].dropna().unique())
+        added = values.difference(df[column].cat.categories)
+        if len(added):
+            df = df.copy(deep=False)
+            df[column] = df[column].cat.add_categories(added)
+    return df
+
+
+def delta_sha(delta_dir, name):
+    """sha256 of one delta file's bytes, without parsing it."""
+    with open(os.path.join(delta_dir, name), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_delta(delta_dir, name):
+    """(cleaned rows, sha256 of the file) for one delta in ``delta_dir``."""
+    return read_delta(os.path.join(delta_dir, name)), delta_sha(delta_dir, name)
@@ -0,0 +1,80 @@
+"""Filtered rows as CSV or Parquet, written a chunk at a time."""
+import importlib.util
+
+import pandas as pd
+
+# Parquet needs pyarrow, which is optional
+PARQUET = importlib.util.find_spec("pyarrow") is not None
+
+
+def _chunks(df, rows, columns, chunk_rows):
+    for start in range(0, len(rows), chunk_rows):
+        yield df.take(rows[start:start + chunk_rows])[columns]
+
+
+def csv_chunks(df, rows, columns, chunk_rows):
+    """CSV text for the rows of ``df`` at positions ``rows``, ``chunk_rows`` rows per piece."""
+    yield df.iloc[:0][columns].to_csv(index=False)
+    for chunk in _chunks(df, rows, columns, chunk_rows):
+        yield chunk.to_csv(index=False, header=False)
+
+
+class _Buffer:
+    """Write-only file that hands back what was written since the last ``drain``."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _arrow_ready(frame):
+    # An Arrow column holds one type, so columns mixing numbers and text (a
+    # voltage of 400 or "-") are written as text
+    mixed = {}
+    for name, column in frame.items():
+        if isinstance(column.dtype, pd.CategoricalDtype) and column.cat.categories.dtype == object:
+            mixed[name] = column.cat.rename_categories(str)
+        elif column.dtype == object:
+            mixed[name] = column.astype("str")
+    return frame.assign(**mixed) if mixed else frame
+
+
+def parquet_chunks(df, rows, columns, chunk_rows):
+    """Parquet bytes for the same rows, one row group per chunk, sent as each group is written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Every row group must have the same schema, whatever values its chunk holds
+    schema = pa.Schema.from_pandas(_arrow_ready(df.iloc[:0][columns]), preserve_index=False)
+    buffer = _Buffer()
+    with pq.ParquetWriter(buffer, schema) as writer:
+        for chunk in _chunks(df, rows, columns, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(_arrow_ready(chunk), schema=schema, preserve_index=False))
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+# Format: (mimetype, chunk writer)
+FORMATS = {"csv": ("text/csv", csv_chunks)}
+if PARQUET:
+    FORMATS["parquet"] = ("application/vnd.apache.parquet", parquet_chunks)
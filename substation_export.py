@@ -0,0 +1,215 @@
+"""Write static dashboard reports for a matrix of filter combinations.
+
+    python substation_export.py --out reports [--by region ownership] [--regions ER1 SR2]
+                                [--ownerships POWERGRID] [--years 2000 2020]
+                                [--map-type light] [--workers 4]
+
+Each report is a directory holding the map (map.html), the spend trend and
+ownership charts (trend.html, pie.html) and the table rows (table.csv), made
+by the same filtering and rendering code as the dashboard. One report is
+written per combination of the values along --by (every region and
+ownership in the dataset unless --regions/--ownerships narrow them); a
+dimension left out of --by applies its given values to every report.
+Combinations with no substations are skipped, and reports/index.csv lists
+the rest.
+
+The dataset and its indexes are loaded once and shared copy-on-write by
+--workers forked processes. Network lines and map layers go through the
+snapshot's shared disk cache, so reports reuse what the dashboard (or an
+earlier run) rendered for the same filters, and the other way round.
+"""
+import argparse
+import collections
+import functools
+import itertools
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+# A run reads one snapshot from start to finish
+os.environ.setdefault("SUBSTATION_RELOAD_INTERVAL", "0")
+
+import Substation_main as app  # noqa: E402
+from substation_cache import filter_key, normalize_filters  # noqa: E402
+from substation_payload import slim_html  # noqa: E402
+from substation_table import TABLE_COLUMNS  # noqa: E402
+
+DIMENSIONS = ("region", "ownership")
+STAGES = ("filter", "map", "charts", "table")
+
+# Standalone pages have none of the dashboard's CSS variables
+REPORT_LAYOUT = dict(font_color="#333", paper_bgcolor="#fff")
+REPORT_PIE_LINE = "#fff"
+
+
+def slug(values):
+    return "+".join(re.sub(r"[^A-Za-z0-9]+", "-", str(value)).strip("-") for value in values)
+
+
+def report_matrix(snap, by=DIMENSIONS, regions=None, ownerships=None, years=None):
+    """(name, filters) for every distinct combination of the values along ``by``; names are unique."""
+    axes = []
+    for dim, given, every in (("region", regions, snap.filter_index.region.values),
+                              ("ownership", ownerships, snap.filter_index.ownership.values)):
+        axes.append([[value] for value in given or every] if dim in by else [given or []])
+    matrix = {}
+    for region, ownership in itertools.product(*axes):
+        parts = [slug(values) for values in (region, ownership) if values]
+        if years:
+            parts.append(f"{years[0]}-{years[1]}")
+        filters = normalize_filters(region, ownership, years)
+        matrix.setdefault(filter_key(filters), ("_".join(parts) or "all", filters))
+    # Values differing only in punctuation or case share a slug (and a
+    # directory on case-insensitive filesystems); those get their filter key
+    counts = collections.Counter(name.lower() for name, _ in matrix.values())
+    return [(f"{name}_{key[:8]}" if counts[name.lower()] > 1 else name, filters)
+            for key, (name, filters) in matrix.items()]
+
+
+@contextmanager
+def timed(timings, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def report_map(snap, store, map_type):
+    """The map document with every marker embedded.
+
+    Above VIEWPORT_THRESHOLD the dashboard's map fetches markers from the
+    server as it pans, which a static page cannot, so those layers are
+    rendered here (and cached on disk under their own key).
+    """
+    from substation_map import apply_tiles, render_layers
+
+    dff = app.get_filtered(snap, store)
+    if dff["Latitude"].notna().sum() <= app.VIEWPORT_THRESHOLD:
+        return app.get_map_html(snap, store, map_type)
+    layers = app.get_shared(("report_layers",) + app.cache_key(snap, store),
+                            lambda: slim_html(render_layers(dff, app.get_segments(snap, store))))
+    return apply_tiles(layers, map_type)
+
+
+@functools.lru_cache(maxsize=None)
+def report_skeletons():
+    """The dashboard's chart figures as dicts, restyled for standalone pages; built once per process."""
+    from substation_figures import pie_skeleton, trend_skeleton
+
+    trend, pie = trend_skeleton(), pie_skeleton()
+    for figure in (trend, pie):
+        figure.update_layout(REPORT_LAYOUT)
+    pie.update_traces(marker_line_color=REPORT_PIE_LINE)
+    return {"trend": trend.to_plotly_json(), "pie": pie.to_plotly_json()}
+
+
+@functools.lru_cache(maxsize=None)
+def plotly_script():
+    """The CDN URL of the plotly.js bundled with the installed plotly."""
+    from plotly.offline import get_plotlyjs_version
+
+    return f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+
+
+def chart_html(skeleton, traces):
+    """A standalone page for ``skeleton`` with each trace's arrays replaced by those in ``traces``.
+
+    Filling a prebuilt dict skips plotly's figure validation, and naming the
+    CDN script directly (rather than include_plotlyjs="cdn") skips hashing
+    the whole plotly.js bundle per page.
+    """
+    import plotly.io as pio
+
+    figure = {**skeleton, "data": [{**trace, **arrays} for trace, arrays in zip(skeleton["data"], traces)]}
+    return pio.to_html(figure, include_plotlyjs=plotly_script(), validate=False)
+
+
+def export_report(report, out_dir, map_type="light"):
+    """Write one report under ``out_dir``; returns (name, filters, rows, seconds by stage)."""
+    from substation_figures import pie_data, trend_data
+
+    name, filters = report
+    snap = app.current_snapshot()
+    store = {"key": filter_key(filters), "filters": filters}
+    timings = {}
+    with timed(timings, "filter"):
+        rows = app.get_rows(snap, store)
+    if not len(rows):
+        return name, filters, 0, timings
+
+    directory = os.path.join(out_dir, name)
+    os.makedirs(directory, exist_ok=True)
+    with timed(timings, "map"):
+        with open(os.path.join(directory, "map.html"), "w", encoding="utf-8") as f:
+            f.write(report_map(snap, store, map_type))
+    with timed(timings, "charts"):
+        summary = app.get_summary(snap, store)
+        labels, values = pie_data(summary)
+        charts = {"trend": [{"x": x, "y": y} for x, y in trend_data(summary)],
+                  "pie": [{"labels": labels, "values": values}]}
+        for chart, traces in charts.items():
+            with open(os.path.join(directory, f"{chart}.html"), "w", encoding="utf-8") as f:
+                f.write(chart_html(report_skeletons()[chart], traces))
+    with timed(timings, "table"):
+        snap.df.take(rows)[TABLE_COLUMNS].to_csv(os.path.join(directory, "table.csv"), index=False)
+    return name, filters, len(rows), timings
+
+
+def export_reports(matrix, out_dir, map_type="light", workers=1):
+    """Yield export_report's result for every report in ``matrix``, as they finish."""
+    export = functools.partial(export_report, out_dir=out_dir, map_type=map_type)
+    # Load the dataset and the rendering libraries before any worker forks
+    app.preload()
+    report_skeletons()
+    plotly_script()
+    if workers <= 1:
+        yield from map(export, matrix)
+        return
+    context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=app.preload) as pool:
+        yield from pool.map(export, matrix)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default="reports", help="directory to write the reports to")
+    parser.add_argument("--by", nargs="*", choices=DIMENSIONS, default=list(DIMENSIONS),
+                        help="dimensions to write one report per value of")
+    parser.add_argument("--regions", nargs="+")
+    parser.add_argument("--ownerships", nargs="+")
+    parser.add_argument("--years", nargs=2, type=int, metavar=("FIRST", "LAST"))
+    parser.add_argument("--map-type", default="light", choices=["light", "dark", "satellite"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    matrix = report_matrix(app.current_snapshot(), args.by, args.regions, args.ownerships, args.years)
+    index, totals, skipped = [], dict.fromkeys(STAGES, 0.0), 0
+    for name, filters, rows, timings in export_reports(matrix, args.out, args.map_type, args.workers):
+        for stage, seconds in timings.items():
+            totals[stage] += seconds
+        if not rows:
+            skipped += 1
+            continue
+        index.append({"report": name, "regions": "|".join(filters["regions"]),
+                      "ownerships": "|".join(filters["ownerships"]),
+                      "years": "-".join(map(str, filters["years"])), "substations": rows})
+    os.makedirs(args.out, exist_ok=True)
+    pd.DataFrame(index, columns=["report", "regions", "ownerships", "years", "substations"]).to_csv(
+        os.path.join(args.out, "index.csv"), index=False)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(index)} reports in {args.out} ({skipped} empty combinations skipped), "
+          f"{elapsed:.1f} s with {args.workers} worker(s): {len(index) / elapsed:.2f} reports/s")
+    print("time per stage, summed over workers: "
+          + ", ".join(f"{stage} {seconds:.1f} s" for stage, seconds in totals.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import math
+
+import plotly.colors
+import plotly.graph_objects as go
+from dash import Patch
+
+from substation_index import SpendCube
+
+TREND_COLORS = ["#4361ee", "#f72585"]
+
+CHART_LAYOUT = dict(
+    plot_bgcolor="rgba(0,0,0,0)",
+    paper_bgcolor="rgba(0,0,0,0)",
+    font_color="var(--text-color)",
+)
+
+
+def trend_skeleton():
+    """The spend trend chart with one empty line per measure.
+
+    Laid out as ``px.line`` would for the same arguments, so only the x/y
+    arrays change from one filter to the next (see ``trend_patch``).
+    """
+    fig = go.Figure([
+        go.Scatter(
+            x=[], y=[], name=measure, legendgroup=measure, mode="lines",
+            line=dict(color=color),
+            hovertemplate=f"variable={measure}<br>Fiscal Year=%{{x}}<br>Average Spend=%{{y}}<extra></extra>",
+        )
+        for measure, color in zip(SpendCube.MEASURES, TREND_COLORS)
+    ])
+    fig.update_layout(
+        title_text="Spend Trend Analysis",
+        xaxis_title_text="Fiscal Year",
+        yaxis_title_text="Average Spend",
+        legend=dict(title_text="Plant Type", tracegroupgap=0),
+        hovermode="x unified",
+        **CHART_LAYOUT,
+    )
+    return fig
+
+
+def pie_skeleton():
+    """The ownership donut with no slices; ``pie_patch`` fills in labels and values."""
+    fig = go.Figure(go.Pie(
+        labels=[], values=[], hole=0.4,
+        textposition="inside",
+        textinfo="percent+label",
+        marker=dict(line=dict(color="var(--bg-color)", width=1)),
+        hovertemplate="Ownership=%{label}<br>Count=%{value}<extra></extra>",
+    ))
+    fig.update_layout(
+        title_text="Ownership Distribution",
+        piecolorway=plotly.colors.sequential.Blues_r,
+        legend_tracegroupgap=0,
+        showlegend=True,
+        **CHART_LAYOUT,
+    )
+    return fig
+
+
+def _wire_values(values, digits=6):
+    """Numbers as a JSON list: ``digits`` significant digits, NaN as null (a gap in the line)."""
+    return [None if math.isnan(value) else float(f"{value:.{digits}g}") for value in map(float, values)]
+
+
+def trend_data(summary):
+    """(x, y) lists for each measure's line, as sent to the browser."""
+    years = [int(year) for year in summary["years"]]
+    return [(years, _wire_values(summary["year_means"][measure])) for measure in SpendCube.MEASURES]
+
+
+def pie_data(summary):
+    """(labels, values) lists for the ownership donut."""
+    counts = summary["ownership_counts"]
+    return [str(label) for label in counts], [int(count) for count in counts.values()]
+
+
+def trend_patch(summary):
+    """A ``Patch`` replacing the trend chart's data arrays with those of ``summary``."""
+    patch = Patch()
+    for i, (x, y) in enumerate(trend_data(summary)):
+        patch["data"][i]["x"] = x
+        patch["data"][i]["y"] = y
+    return patch
+
+
+def pie_patch(summary):
+    """A ``Patch`` replacing the ownership donut's labels and values with those of ``summary``."""
+    labels, values = pie_data(summary)
+    patch = Patch()
+    patch["data"][0]["labels"] = labels
+    patch["data"][0]["values"] = values
+    return patch
+
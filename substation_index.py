@@ -0,0 +1,362 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from substation_spatial import SpatialIndex
+
+
+def patch_order(order, keys, positions):
+    """Stable order of ``keys`` from the previous one, re-placing only ``positions``.
+
+    ``order`` must be the stable argsort of the old keys, and every untouched
+    row must keep its relative key order (codes may shift, but monotonically).
+    Positions past the old length are appended rows.
+    """
+    size = len(keys)
+    moved = np.zeros(size, dtype=bool)
+    moved[positions] = True
+    kept = order[~moved[order]]
+    positions = np.unique(positions)
+    # (key, position) as one int64 so a single binary search merges both runs
+    scale = np.int64(size + 1)
+    kept_key = keys[kept].astype(np.int64) * scale + kept
+    new_key = keys[positions].astype(np.int64) * scale + positions
+    new_sorted = np.argsort(new_key, kind="stable")
+    slots = np.searchsorted(kept_key, new_key[new_sorted])
+    return np.insert(kept, slots, positions[new_sorted])
+
+
+def _search_codes(array, values):
+    """Position of each value in the sorted object ``array``; len(array) when absent or missing."""
+    values = pd.Series(values, dtype=object)
+    codes = np.full(len(values), len(array), dtype=np.int32)
+    present = np.flatnonzero(values.notna().to_numpy())
+    if len(present) and len(array):
+        wanted = values.to_numpy()[present]
+        slots = np.minimum(np.searchsorted(array, wanted), len(array) - 1)
+        found = array[slots] == wanted
+        codes[present[found]] = slots[found]
+    return codes
+
+
+def _categorical_codes(series):
+    """(sorted values in use, int32 codes into them) for a categorical column.
+
+    Works on the column's codes, so the rows are never turned into strings.
+    Missing rows get the trailing code, len(values).
+    """
+    categories = series.cat.categories
+    codes = series.cat.codes.to_numpy()
+    used = np.flatnonzero(np.bincount(codes + 1, minlength=len(categories) + 1)[1:])
+    in_use = categories.take(used)
+    order = np.argsort(in_use.to_numpy(dtype=object), kind="stable")
+    # Category -> rank among the used values; the extra last slot takes code -1
+    remap = np.full(len(categories) + 1, len(used), dtype=np.int32)
+    remap[used[order]] = np.arange(len(used), dtype=np.int32)
+    return in_use.take(order).tolist(), remap[codes]
+
+
+class CategoryIndex:
+    """Row positions grouped by category, with per-row codes for probing."""
+
+    def __init__(self, series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            values, codes = _categorical_codes(series)
+            lookup = None
+        else:
+            values = sorted(series.dropna().unique().tolist())
+            lookup = {v: i for i, v in enumerate(values)}
+            # Missing values get the trailing code so they are never selected
+            codes = series.map(lookup).fillna(len(values)).to_numpy(dtype=np.int32)
+        # Codes follow the sorted values, so this is also the column's sort order
+        self._set(values, codes, np.argsort(codes, kind="stable"), lookup)
+
+    def _set(self, values, codes, order, lookup=None, array=None):
+        self.values = values
+        self.codes = codes
+        self.order = order
+        self.offsets = np.searchsorted(codes[order], np.arange(len(values) + 2))
+        self._lookup = lookup
+        self._array = array
+
+    @property
+    def lookup(self):
+        # Built on demand: after an update of a near-unique column (names) it
+        # would cost a full pass that most updates never need
+        if self._lookup is None:
+            self._lookup = {v: i for i, v in enumerate(self.values)}
+        return self._lookup
+
+    @property
+    def array(self):
+        """Sorted values as an object array, for binary searches."""
+        if self._array is None:
+            self._array = np.array(self.values, dtype=object)
+        return self._array
+
+    def codes_of(self, values):
+        return _search_codes(self.array, values)
+
+    def updated(self, positions, values):
+        """Index of the same column with the rows at ``positions`` set to ``values``.
+
+        Positions past the end append rows. Values are located by binary
+        search, untouched rows are re-coded through a remap table instead of
+        being hashed again, and the sort order is patched rather than redone.
+        """
+        values = pd.Series(values, dtype=object)
+        unknown = values.notna().to_numpy() & (self.codes_of(values) == len(self.values))
+        added = np.array(sorted(set(values[unknown].tolist())), dtype=object)
+        if len(added):
+            # Old value i moves up by the number of new values sorting before it
+            slots = np.searchsorted(self.array, added)
+            shift = np.bincount(slots, minlength=len(self.values) + 1).cumsum()
+            remap = (np.arange(len(self.values) + 1) + shift).astype(np.int32)
+            remap[-1] = len(self.values) + len(added)
+            array = np.insert(self.array, slots, added)
+            merged, lookup, codes = array.tolist(), None, remap[self.codes]
+        else:
+            array, merged, lookup, codes = self.array, self.values, self._lookup, self.codes.copy()
+
+        size = max(len(codes), int(positions.max()) + 1) if len(positions) else len(codes)
+        if size > len(codes):
+            codes = np.concatenate([codes, np.full(size - len(codes), len(merged), dtype=np.int32)])
+        codes[positions] = _search_codes(array, values)
+
+        index = copy.copy(self)
+        index._set(merged, codes, patch_order(self.order, codes, positions), lookup, array)
+        return index
+
+    def select_codes(self, selected):
+        return np.array([self.lookup[v] for v in selected if v in self.lookup], dtype=np.int32)
+
+    def count(self, codes):
+        return int((self.offsets[codes + 1] - self.offsets[codes]).sum())
+
+    def positions(self, codes):
+        parts = [self.order[self.offsets[c]:self.offsets[c + 1]] for c in codes]
+        if not parts:
+            return np.empty(0, dtype=self.order.dtype)
+        return np.sort(np.concatenate(parts))
+
+    def table(self):
+        """Values by code, with None in the trailing missing slot."""
+        return np.array(self.values + [None], dtype=object)
+
+    def mask(self, codes):
+        member = np.zeros(len(self.values) + 1, dtype=bool)
+        member[codes] = True
+        return member
+
+
+class FilterIndex:
+    """Load-time index answering the dashboard filters without scanning df.
+
+    ``positions`` returns sorted row positions or None when no filter is active.
+    The most selective dimension is materialised from its index and the other
+    dimensions are probed only on those candidates, so the cost follows the
+    result size rather than the table size. Spatial filters (``near`` =
+    [lat, lon, radius_km], ``bbox`` = [south, west, north, east]) are answered
+    by the SpatialIndex and intersected with the rest.
+    """
+
+    def __init__(self, df):
+        self.size = len(df)
+        self.region = CategoryIndex(df["Region"])
+        self.ownership = CategoryIndex(df["Substation Ownership"])
+        self.years = df["SS_FisYearName"].to_numpy()
+        self.year_order = np.argsort(self.years, kind="stable")
+        self.sorted_years = self.years[self.year_order]
+        self.spatial = SpatialIndex(df)
+
+    def updated(self, df, positions):
+        """Index for ``df``, which differs from the indexed frame only at ``positions``."""
+        index = copy.copy(self)
+        index.size = len(df)
+        index.region = self.region.updated(positions, df["Region"].iloc[positions].to_numpy(dtype=object))
+        index.ownership = self.ownership.updated(
+            positions, df["Substation Ownership"].iloc[positions].to_numpy(dtype=object))
+        index.years = df["SS_FisYearName"].to_numpy()
+        index.year_order = patch_order(self.year_order, index.years, positions)
+        index.sorted_years = index.years[index.year_order]
+        index.spatial = self.spatial.updated(df, positions)
+        return index
+
+    def _year_bounds(self, years):
+        lo = np.searchsorted(self.sorted_years, years[0], side="left")
+        hi = np.searchsorted(self.sorted_years, years[1], side="right")
+        return lo, hi
+
+    def positions(self, regions=None, ownerships=None, years=None, near=None, bbox=None):
+        dims = []
+        if near:
+            rows = self.spatial.within_radius(*near)
+            dims.append((len(rows), "rows", rows))
+        if bbox:
+            rows = self.spatial.within_bbox(*bbox)
+            dims.append((len(rows), "rows", rows))
+        if regions:
+            codes = self.region.select_codes(regions)
+            dims.append((self.region.count(codes), "region", codes))
+        if ownerships:
+            codes = self.ownership.select_codes(ownerships)
+            dims.append((self.ownership.count(codes), "ownership", codes))
+        if years:
+            lo, hi = self._year_bounds(years)
+            dims.append((max(hi - lo, 0), "year", (lo, hi)))
+        if not dims:
+            return None
+
+        dims.sort(key=lambda d: d[0])
+        _, name, arg = dims[0]
+        if name == "year":
+            rows = np.sort(self.year_order[arg[0]:arg[1]])
+        elif name == "rows":
+            rows = arg
+        else:
+            rows = getattr(self, name).positions(arg)
+
+        for _, name, arg in dims[1:]:
+            if not len(rows):
+                break
+            if name == "year":
+                y = self.years[rows]
+                rows = rows[(y >= years[0]) & (y <= years[1])]
+            elif name == "rows":
+                rows = np.intersect1d(rows, arg, assume_unique=True)
+            else:
+                cat = getattr(self, name)
+                rows = rows[cat.mask(arg)[cat.codes[rows]]]
+        return rows
+
+    def rows(self, regions=None, ownerships=None, years=None, near=None, bbox=None):
+        """Like positions, but an explicit range when nothing is filtered."""
+        rows = self.positions(regions, ownerships, years, near, bbox)
+        return np.arange(self.size) if rows is None else rows
+
+    def frame(self, df, regions=None, ownerships=None, years=None, near=None, bbox=None):
+        rows = self.positions(regions, ownerships, years, near, bbox)
+        return df if rows is None else df.take(rows)
+
+
+class SpendCube:
+    """Sums, counts and non-null counts of spend by (Region, Ownership, Year).
+
+    Every chart and metric card is a reduction over a handful of cells, so a
+    filter change costs the same whatever the number of substations. Filters
+    the cube has no axis for (spatial ones) go through ``summary_rows``, which
+    bins just the selected rows into a cube of the same shape.
+    """
+
+    MEASURES = ("Planning Plant", "Maintenence Plant")
+
+    def __init__(self, df, index):
+        self.regions = index.region.values
+        self.ownerships = index.ownership.values
+        self.years = np.unique(index.years)
+        # Missing regions/ownerships keep their own trailing slot
+        self.shape = (len(self.regions) + 1, len(self.ownerships) + 1, len(self.years))
+        year_codes = np.searchsorted(self.years, index.years)
+        cells = np.ravel_multi_index((index.region.codes, index.ownership.codes, year_codes), self.shape)
+        self.cells = cells
+        self.values = [df[measure].to_numpy(dtype=float) for measure in self.MEASURES]
+        self.count, self.sums, self.nonnull = self._bin(cells, self.values)
+        self._region_lookup = index.region.lookup
+        self._ownership_lookup = index.ownership.lookup
+
+    def updated(self, df, index, positions):
+        """Cube for ``df``, which differs from the binned frame only at ``positions``.
+
+        The old contributions of those rows are subtracted and the new ones
+        added. A new region, ownership or year changes the cube's shape, so
+        that case is rebuilt from scratch.
+        """
+        years = np.unique(index.years[positions])
+        if index.region.values != self.regions or index.ownership.values != self.ownerships \
+                or not np.isin(years, self.years).all():
+            return SpendCube(df, index)
+
+        cube = copy.copy(self)
+        old = positions[positions < len(self.cells)]
+        cells = np.ravel_multi_index(
+            (index.region.codes[positions], index.ownership.codes[positions],
+             np.searchsorted(self.years, index.years[positions])),
+            self.shape)
+        values = [df[measure].to_numpy(dtype=float) for measure in self.MEASURES]
+
+        removed = self._bin(self.cells[old], [v[old] for v in self.values])
+        added = self._bin(cells, [v[positions] for v in values])
+        cube.count, cube.sums, cube.nonnull = (
+            current - gone + new for current, gone, new in zip((self.count, self.sums, self.nonnull), removed, added))
+        cube.cells = np.empty(len(df), dtype=self.cells.dtype)
+        cube.cells[:len(self.cells)] = self.cells
+        cube.cells[positions] = cells
+        cube.values = values
+        return cube
+
+    def _bin(self, cells, values):
+        size = int(np.prod(self.shape))
+        count = np.bincount(cells, minlength=size).reshape(self.shape)
+        sums = np.empty((len(self.MEASURES),) + self.shape)
+        nonnull = np.empty((len(self.MEASURES),) + self.shape, dtype=np.int64)
+        for i, measure in enumerate(values):
+            ok = ~np.isnan(measure)
+            sums[i] = np.bincount(cells[ok], weights=measure[ok], minlength=size).reshape(self.shape)
+            nonnull[i] = np.bincount(cells[ok], minlength=size).reshape(self.shape)
+        return count, sums, nonnull
+
+    @staticmethod
+    def _axis(selected, lookup, size):
+        if not selected:
+            return np.arange(size)
+        return np.array(sorted({lookup[v] for v in selected if v in lookup}), dtype=np.intp)
+
+    def summary(self, regions=None, ownerships=None, years=None):
+        r = self._axis(regions, self._region_lookup, self.shape[0])
+        o = self._axis(ownerships, self._ownership_lookup, self.shape[1])
+        if years:
+            lo = np.searchsorted(self.years, years[0], side="left")
+            hi = np.searchsorted(self.years, years[1], side="right")
+            y = np.arange(lo, hi)
+        else:
+            y = np.arange(self.shape[2])
+        return self._reduce(self.count, self.sums, self.nonnull, r, o, y)
+
+    def summary_rows(self, rows):
+        """Same as ``summary`` for an explicit set of row positions."""
+        count, sums, nonnull = self._bin(self.cells[rows], [v[rows] for v in self.values])
+        return self._reduce(count, sums, nonnull, *(np.arange(n) for n in self.shape))
+
+    def _reduce(self, count, sums, nonnull, r, o, y):
+        cells = np.ix_(r, o, y)
+        count = count[cells]
+        sums = sums[(slice(None),) + cells]
+        nonnull = nonnull[(slice(None),) + cells]
+
+        year_count = count.sum(axis=(0, 1))
+        has_rows = year_count > 0
+        year_sums = sums.sum(axis=(1, 2))[:, has_rows]
+        year_nonnull = nonnull.sum(axis=(1, 2))[:, has_rows]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            year_means = np.where(year_nonnull > 0, year_sums / year_nonnull, np.nan)
+            totals = sums.sum(axis=(1, 2, 3)) / nonnull.sum(axis=(1, 2, 3))
+
+        # The missing slot is the last one on each category axis
+        region_rows = count.sum(axis=(1, 2))[r < len(self.regions)]
+        owner_rows = count.sum(axis=(0, 2))
+        owner_counts = {
+            self.ownerships[code]: int(n)
+            for code, n in zip(o, owner_rows)
+            if code < len(self.ownerships) and n > 0
+        }
+        finite = totals[~np.isnan(totals)]
+
+        return {
+            "years": self.years[y][has_rows],
+            "year_means": dict(zip(self.MEASURES, year_means)),
+            "ownership_counts": dict(sorted(owner_counts.items(), key=lambda kv: -kv[1])),
+            "total": int(count.sum()),
+            "regions": int((region_rows > 0).sum()),
+            "avg_spend": float(finite.mean()) if len(finite) else float("nan"),
+        }
@@ -0,0 +1,173 @@
+import os
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from dash.background_callback.managers import BaseBackgroundCallbackManager
+from dash.exceptions import PreventUpdate
+
+from substation_cache import DiskCache
+
+
+class JobCancelled(Exception):
+    """Raised by ``set_progress`` inside a job that has been cancelled."""
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobManager(BaseBackgroundCallbackManager):
+    """Dash background-callback manager: a thread pool per process, state in a shared directory.
+
+    A job runs on one of ``threads`` threads in the worker process that
+    received the callback. Its result, progress and cancellation marker live in
+    a DiskCache under ``directory``, so the browser's polls (and its requests
+    to cancel) may reach any gunicorn worker on the host.
+
+    Threads cannot be killed, so cancellation is cooperative: a job cancelled
+    while queued never starts, and a running one stops at its next
+    ``set_progress`` call, which raises JobCancelled. Dash cancels a job when
+    the callback that started it fires again in the same page, so a job whose
+    result would be superseded gives up its thread.
+
+    Results are kept, least recently used first out within ``max_bytes``,
+    instead of being deleted once read; two pages waiting on the same
+    arguments both get the result. ``on_finish(name, seconds, outcome)`` is
+    called after every job with outcome "done", "cancelled" or "error".
+
+    Only the manager methods Dash documents are implemented, and none of its
+    private modules are used. Jobs therefore run without a callback context:
+    a background callback here cannot read ``callback_context`` or call
+    ``set_props``. The manager protocol changes between Dash releases, so
+    requirements.txt pins the range this was written against.
+    """
+
+    def __init__(self, directory, max_bytes, threads=1, on_finish=None):
+        self.store = DiskCache(directory, max_bytes)
+        self.threads = threads
+        self.on_finish = on_finish
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        super().__init__(cache_by=None)
+
+    def _executor(self):
+        # One pool per process: a pool created before gunicorn forks has no
+        # threads in the workers
+        with self._lock:
+            if self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix="substation-job")
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    @staticmethod
+    def _progress_key(key):
+        return "progress", key
+
+    def call_job_fn(self, key, job_fn, args, context):
+        job = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        self.store.put(("running", job), True)
+        self._executor().submit(job_fn, key, self._progress_key(key), args, job)
+        return job
+
+    def make_job_fn(self, fn, progress, key=None):
+        name = getattr(fn, "__name__", "job")
+
+        def set_progress(job, progress_key, value):
+            if ("cancelled", job) in self.store:
+                raise JobCancelled(job)
+            self.store.put(progress_key, list(value) if isinstance(value, (list, tuple)) else [value])
+
+        def run(progress_key, args, job):
+            leading = [lambda value: set_progress(job, progress_key, value)] if progress else []
+            try:
+                if isinstance(args, dict):
+                    return fn(*leading, **args)
+                return fn(*leading, *(args if isinstance(args, (list, tuple)) else [args]))
+            except PreventUpdate:
+                return {"_dash_no_update": "_dash_no_update"}
+
+        def job_fn(result_key, progress_key, args, job):
+            start = time.perf_counter()
+            outcome = "cancelled"
+            try:
+                if ("cancelled", job) not in self.store:
+                    value = run(progress_key, args, job)
+                    outcome = "done"
+                    self.store.put(result_key, value)
+            except JobCancelled:
+                pass
+            except Exception as err:
+                outcome = "error"
+                self.store.put(result_key, {"background_callback_error": {"msg": str(err),
+                                                                          "tb": traceback.format_exc()}})
+            finally:
+                self.store.delete(("running", job))
+                self.store.delete(("cancelled", job))
+                if self.on_finish is not None:
+                    self.on_finish(name, time.perf_counter() - start, outcome)
+
+        return job_fn
+
+    def terminate_job(self, job):
+        if job is not None and ("running", job) in self.store:
+            self.store.put(("cancelled", job), True)
+            self.store.delete(("running", job))
+
+    def terminate_unhealthy_job(self, job):
+        if job is not None and ("running", job) in self.store and not self.job_running(job):
+            self.store.delete(("running", job))
+            return True
+        return False
+
+    def job_running(self, job):
+        # A job whose worker died leaves its marker behind; the pid tells
+        if job is None or ("running", job) not in self.store:
+            return False
+        return _alive(int(str(job).split("-", 1)[0]))
+
+    def get_progress(self, key):
+        progress_key = self._progress_key(key)
+        value = self.store.get(progress_key)
+        if value is not None:
+            self.store.delete(progress_key)
+        return value
+
+    def result_ready(self, key):
+        return key in self.store
+
+    def get_result(self, key, job):
+        value = self.store.get(key)
+        self.store.delete(self._progress_key(key))
+        return self.UNDEFINED if value is None else value
+
+    def get_updated_props(self, key):
+        # Jobs cannot call set_props (see the class docstring)
+        return {}
+
+    def get_or_create_signing_secret(self, generate):
+        # Published with a hard link, which fails if another worker got there
+        # first; every worker then reads back the same secret
+        path = os.path.join(self.store.directory, "signing-secret")
+        os.makedirs(self.store.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.store.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(generate())
+            os.link(tmp, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp)
+        with open(path, "rb") as f:
+            return f.read()
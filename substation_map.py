@@ -0,0 +1,264 @@
+import json
+import warnings
+
+import folium
+import numpy as np
+from branca.element import CssLink, MacroElement
+from folium.plugins import MarkerCluster
+from folium.template import Template, tojavascript
+
+from substation_spatial import network_segments
+
+TILE_STYLES = {
+    "satellite": (
+        "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
+        "Tiles &copy; Esri &mdash; Source: Esri, i-cubed, USDA, USGS, AEX, GeoEye, Getmapping, Aerogrid, IGN, IGP, UPR-EGP, and the GIS User Community",
+    ),
+    "dark": ("CartoDB dark_matter", ""),
+    "light": ("OpenStreetMap", ""),
+}
+
+# Used when the filtered set has no coordinates at all
+DEFAULT_CENTER = [22.5, 80.0]
+
+
+def _encode(values):
+    """Dictionary-encode a column into (table, codes)."""
+    uniques, codes = np.unique(values.astype(str), return_inverse=True)
+    return uniques.tolist(), codes.tolist()
+
+
+def marker_payload(dff_map):
+    """Columnar marker data: coordinates plus dictionary-encoded popup fields."""
+    regions, region_codes = _encode(dff_map["Region"].to_numpy(dtype=object))
+    owners, owner_codes = _encode(dff_map["Substation Ownership"].to_numpy(dtype=object))
+    return {
+        "lat": dff_map["Latitude"].to_numpy(dtype=float).round(6).tolist(),
+        "lon": dff_map["Longitude"].to_numpy(dtype=float).round(6).tolist(),
+        "name": dff_map["Substation Name"].astype(str).tolist(),
+        "year": dff_map["SS_FisYearName"].astype(int).tolist(),
+        "regions": regions,
+        "region": region_codes,
+        "owners": owners,
+        "owner": owner_codes,
+    }
+
+
+class SubstationMarkers(MarkerCluster):
+    """One clustered layer built in the browser from a columnar payload.
+
+    Replaces a folium.Marker (with its own Icon and Popup element) per row;
+    the icon is shared and popups are only built when opened.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function(){
+                var d = {{ this.payload|tojson }};
+                var cluster = L.markerClusterGroup({{ this.options|tojavascript }});
+                var icon = L.AwesomeMarkers.icon(
+                    {icon: "bolt", prefix: "fa", markerColor: "lightblue", iconColor: "white"}
+                );
+                function esc(s) {
+                    return String(s).replace(/[&<>"']/g, function (c) {
+                        return "&#" + c.charCodeAt(0) + ";";
+                    });
+                }
+                function popup(i) {
+                    return function () {
+                        return "<b>" + esc(d.name[i]) + "</b><br>"
+                            + '<table style="width:100%">'
+                            + "<tr><td>Region:</td><td>" + esc(d.regions[d.region[i]]) + "</td></tr>"
+                            + "<tr><td>Ownership:</td><td>" + esc(d.owners[d.owner[i]]) + "</td></tr>"
+                            + "<tr><td>Year:</td><td>" + d.year[i] + "</td></tr>"
+                            + "</table>";
+                    };
+                }
+                var markers = new Array(d.lat.length);
+                for (var i = 0; i < d.lat.length; i++) {
+                    markers[i] = L.marker([d.lat[i], d.lon[i]], {icon: icon}).bindPopup(popup(i));
+                }
+                cluster.addLayers(markers);
+                cluster.addTo({{ this._parent.get_name() }});
+                return cluster;
+            })();
+        {% endmacro %}"""
+    )
+
+    def __init__(self, dff_map, **kwargs):
+        kwargs.setdefault("chunkedLoading", True)
+        super().__init__(**kwargs)
+        self._name = "SubstationMarkers"
+        self.payload = marker_payload(dff_map)
+
+
+TILE_TOKEN = '"__SUBSTATION_TILE_LAYER__"'
+
+
+class TilePlaceholder(MacroElement):
+    """Marks where the tile layer goes so one render serves every map style."""
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            L.tileLayer(""" + TILE_TOKEN + """).addTo({{ this._parent.get_name() }});
+        {% endmacro %}"""
+    )
+
+
+def _tile_arguments(map_type):
+    tiles, attr = TILE_STYLES.get(map_type, TILE_STYLES["light"])
+    with warnings.catch_warnings():
+        # folium warns that CartoDB wants an API key; the public tiles still load
+        warnings.simplefilter("ignore", UserWarning)
+        layer = folium.TileLayer(tiles, attr=attr or None)
+    return f"{tojavascript(layer.tiles)}, {tojavascript(layer.options)}"
+
+
+TILE_ARGUMENTS = {map_type: _tile_arguments(map_type) for map_type in TILE_STYLES}
+
+
+class ViewportClusters(MacroElement):
+    """Markers fetched from the server for the current viewport and zoom.
+
+    Used instead of SubstationMarkers for large selections: the document only
+    carries the endpoint URL, and each pan/zoom asks for the clusters, points
+    and (when zoomed in) network segments that are on screen.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            (function(){
+                var map = {{ this._parent.get_name() }};
+                var layer = L.layerGroup().addTo(map);
+                var icon = L.AwesomeMarkers.icon(
+                    {icon: "bolt", prefix: "fa", markerColor: "lightblue", iconColor: "white"}
+                );
+                var pending = null;
+                function esc(s) {
+                    return String(s).replace(/[&<>"']/g, function (c) {
+                        return "&#" + c.charCodeAt(0) + ";";
+                    });
+                }
+                function clusterIcon(count) {
+                    var size = count < 100 ? 30 : count < 1000 ? 40 : 50;
+                    return L.divIcon({
+                        html: "<div><span>" + count.toLocaleString() + "</span></div>",
+                        className: "marker-cluster marker-cluster-" + (size === 30 ? "small" : size === 40 ? "medium" : "large"),
+                        iconSize: L.point(size, size)
+                    });
+                }
+                function render(d) {
+                    layer.clearLayers();
+                    d.segments.forEach(function (seg) {
+                        L.polyline(seg, {color: "red", weight: 2, opacity: 0.7}).addTo(layer);
+                    });
+                    d.clusters.forEach(function (c) {
+                        L.marker([c[0], c[1]], {icon: clusterIcon(c[2])})
+                            .on("click", function () { map.setView([c[0], c[1]], map.getZoom() + 2); })
+                            .addTo(layer);
+                    });
+                    d.points.forEach(function (p) {
+                        L.marker([p[0], p[1]], {icon: icon}).bindPopup(function () {
+                            return "<b>" + esc(p[2]) + "</b><br>"
+                                + '<table style="width:100%">'
+                                + "<tr><td>Region:</td><td>" + esc(d.regions[p[3]]) + "</td></tr>"
+                                + "<tr><td>Ownership:</td><td>" + esc(d.owners[p[4]]) + "</td></tr>"
+                                + "<tr><td>Year:</td><td>" + esc(p[5]) + "</td></tr>"
+                                + "</table>";
+                        }).addTo(layer);
+                    });
+                }
+                function refresh() {
+                    if (pending) { pending.abort(); }
+                    pending = new AbortController();
+                    var b = map.getBounds();
+                    var params = new URLSearchParams({
+                        filters: {{ this.filters|tojson }},
+                        z: map.getZoom(),
+                        south: b.getSouth(), west: b.getWest(), north: b.getNorth(), east: b.getEast()
+                    });
+                    fetch({{ this.endpoint|tojson }} + "?" + params.toString(), {signal: pending.signal})
+                        .then(function (r) { return r.json(); })
+                        .then(render)
+                        .catch(function (e) { if (e.name !== "AbortError") { console.error(e); } });
+                }
+                map.on("moveend", refresh);
+                refresh();
+            })();
+        {% endmacro %}"""
+    )
+
+    def __init__(self, endpoint, filters):
+        super().__init__()
+        self._name = "ViewportClusters"
+        self.endpoint = endpoint
+        self.filters = json.dumps(filters, sort_keys=True, separators=(",", ":"))
+
+
+def base_map(dff_map, map_type=None):
+    """A folium.Map centred on dff_map; ``map_type=None`` leaves a tile placeholder."""
+    if len(dff_map):
+        center = [float(dff_map["Latitude"].mean()), float(dff_map["Longitude"].mean())]
+    else:
+        center = DEFAULT_CENTER
+    if map_type is None:
+        m = folium.Map(location=center, zoom_start=5, tiles=None)
+        TilePlaceholder().add_to(m)
+        return m
+    tiles, attr = TILE_STYLES.get(map_type, TILE_STYLES["light"])
+    return folium.Map(location=center, zoom_start=5, tiles=tiles, attr=attr)
+
+
+def add_network_lines(m, segments):
+    """One multi-segment PolyLine per region instead of a layer per station pair."""
+    for region, pairs in segments.items():
+        if len(pairs):
+            folium.PolyLine(
+                locations=pairs.round(6).tolist(),
+                color="red",
+                weight=2,
+                opacity=0.7,
+                tooltip=region
+            ).add_to(m)
+
+
+def build_map(dff, map_type=None, segments=None):
+    dff_map = dff.dropna(subset=["Latitude", "Longitude"])
+    m = base_map(dff_map, map_type)
+    SubstationMarkers(dff_map).add_to(m)
+    add_network_lines(m, network_segments(dff_map) if segments is None else segments)
+    return m
+
+
+def render_layers(dff, segments=None, progress=None):
+    """Full map document with markers and lines but no tiles (see apply_tiles).
+
+    ``progress(label)``, if given, is called between building the map and
+    rendering it, the slowest step.
+    """
+    m = build_map(dff, segments=segments)
+    if progress is not None:
+        progress("Rendering map")
+    return m.get_root().render()
+
+
+def render_viewport_layers(dff, endpoint, filters):
+    """Tile-free map document whose markers are loaded per viewport from endpoint."""
+    dff_map = dff.dropna(subset=["Latitude", "Longitude"])
+    m = base_map(dff_map)
+    # The cluster bubbles reuse Leaflet.markercluster's stylesheet
+    for name, url in MarkerCluster.default_css:
+        m.get_root().header.add_child(CssLink(url), name=name)
+    ViewportClusters(endpoint, filters).add_to(m)
+    return m.get_root().render()
+
+
+def apply_tiles(layers_html, map_type):
+    return layers_html.replace(TILE_TOKEN, TILE_ARGUMENTS.get(map_type, TILE_ARGUMENTS["light"]), 1)
+
+
+def render_map(dff, map_type):
+    return apply_tiles(render_layers(dff), map_type)
@@ -0,0 +1,36 @@
+import os
+
+
+def process_memory(pid=None):
+    """Resident memory of a process in bytes: rss, pss, uss and shared.
+
+    PSS charges each shared page to the processes mapping it in equal parts,
+    so summing it over gunicorn workers gives their real combined footprint,
+    and USS is what a worker would free on exit. Both come from
+    /proc/<pid>/smaps_rollup; elsewhere only the peak RSS is available.
+    """
+    pid = os.getpid() if pid is None else int(pid)
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        if pid != os.getpid():
+            return {"pid": pid}
+        import resource
+        import sys
+
+        # ru_maxrss is kilobytes on Linux and bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return {"pid": pid, "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale}
+
+    return {
+        "pid": pid,
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
@@ -0,0 +1,224 @@
+import bisect
+import cProfile
+import functools
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Cumulative histogram per label set, rendered in the Prometheus text format."""
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in series:
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                running += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, labels, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {running}")
+        return lines
+
+
+class RequestMetrics:
+    """Per-request latency, stage timings and response sizes for a Flask server.
+
+    Each request is labelled with the Dash callback that served it (set by
+    ``callback``) or else its Flask endpoint. Code inside a request marks
+    sub-stages with ``stage(name)``; time in a stage entered more than once is
+    summed, and different stages may nest, so they need not add up.
+    Callback requests also get a ``serialize`` stage: the time outside the
+    callback body, which is mostly Dash encoding the response. Every response
+    carries the stages in a ``Server-Timing`` header. Response sizes are
+    recorded before and after compression (see substation_payload), and
+    callbacks report their outputs before and after slimming through
+    ``record_output``. Background jobs run outside any request and report
+    their run time and outcome through ``record_job``.
+
+    ``profile_rate`` of requests run under cProfile, at most one at a time
+    per process; those slower than ``slow_seconds`` go to
+    ``on_slow(handler, seconds, stats)``. Counts are per process, so with
+    several gunicorn workers each scrape sees one worker.
+    """
+
+    def __init__(self, prefix="substation", profile_rate=0.0, slow_seconds=1.0, on_slow=None):
+        self.requests = Histogram(f"{prefix}_request_seconds", "Request latency by handler.",
+                                  ["handler"], LATENCY_BUCKETS)
+        self.stages = Histogram(f"{prefix}_stage_seconds", "Time spent in each stage of a request.",
+                                ["handler", "stage"], LATENCY_BUCKETS)
+        self.sizes = Histogram(f"{prefix}_response_bytes", "Response body size by handler, before compression.",
+                               ["handler"], BYTE_BUCKETS)
+        self.wire_sizes = Histogram(f"{prefix}_response_wire_bytes", "Response body size by handler, as sent.",
+                                    ["handler"], BYTE_BUCKETS)
+        self.outputs = Histogram(f"{prefix}_output_bytes", "Callback output size before and after slimming.",
+                                 ["output", "form"], BYTE_BUCKETS)
+        self.jobs = Histogram(f"{prefix}_job_seconds", "Background job run time by outcome.",
+                              ["job", "outcome"], LATENCY_BUCKETS)
+        self.profile_rate = profile_rate
+        self.slow_seconds = slow_seconds
+        self.on_slow = on_slow
+        # Python allows one active profiler per process (3.12+ raises
+        # ValueError for a second), so threaded workers profile one request
+        # at a time and skip sampling while another is being profiled
+        self._profiling = threading.Lock()
+
+    def instrument(self, server, exclude=("/metrics",)):
+        excluded = set(exclude)
+
+        @server.before_request
+        def start():
+            if request.path in excluded:
+                return
+            g.metrics_start = time.perf_counter()
+            g.metrics_stages = []
+            if self.profile_rate and random.random() < self.profile_rate and self._profiling.acquire(blocking=False):
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                except ValueError:
+                    # Something outside this class is profiling
+                    self._profiling.release()
+                else:
+                    g.metrics_profile = profile
+
+        def stop_profile():
+            profile = g.pop("metrics_profile", None)
+            if profile is not None:
+                profile.disable()
+                self._profiling.release()
+            return profile
+
+        @server.after_request
+        def finish(response):
+            start = g.pop("metrics_start", None)
+            if start is None:
+                return response
+            profile = stop_profile()
+            elapsed = time.perf_counter() - start
+            handler = g.get("metrics_callback") or request.endpoint or "unmatched"
+            # A stage entered several times (one filter per cached lookup) counts once
+            stages = {}
+            for name, seconds in g.pop("metrics_stages", []):
+                stages[name] = stages.get(name, 0.0) + seconds
+            if "metrics_callback_seconds" in g:
+                stages["serialize"] = elapsed - g.metrics_callback_seconds
+
+            self.requests.observe(elapsed, handler)
+            for name, seconds in stages.items():
+                self.stages.observe(seconds, handler, name)
+            if not response.is_streamed:
+                wire = len(response.get_data())
+                self.sizes.observe(g.pop("uncompressed_bytes", wire), handler)
+                self.wire_sizes.observe(wire, handler)
+            response.headers["Server-Timing"] = ", ".join(
+                [f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages.items()]
+                + [f"total;dur={elapsed * 1000:.2f}"])
+            if profile is not None and elapsed >= self.slow_seconds and self.on_slow is not None:
+                self.on_slow(handler, elapsed, pstats.Stats(profile))
+            return response
+
+        @server.teardown_request
+        def release(exc):
+            # after_request is skipped when the view raised
+            stop_profile()
+
+    def callback(self, func):
+        """Wrap a Dash callback so its requests are labelled and timed by name."""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not has_request_context():
+                return func(*args, **kwargs)
+            g.metrics_callback = func.__name__
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                g.metrics_callback_seconds = time.perf_counter() - start
+
+        return wrapper
+
+    def record_output(self, output, raw_bytes, slim_bytes):
+        """Sizes of one callback output before and after slimming."""
+        self.outputs.observe(raw_bytes, output, "raw")
+        self.outputs.observe(slim_bytes, output, "slim")
+
+    def record_job(self, job, seconds, outcome):
+        """Run time of one background job ("done", "cancelled" or "error")."""
+        self.jobs.observe(seconds, job, outcome)
+
+    @contextmanager
+    def stage(self, name):
+        if not has_request_context() or "metrics_stages" not in g:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            g.metrics_stages.append((name, time.perf_counter() - start))
+
+    def render(self):
+        lines = []
+        for histogram in (self.requests, self.stages, self.sizes, self.wire_sizes, self.outputs, self.jobs):
+            lines += histogram.render()
+        return "\n".join(lines) + "\n"
+
+
+def profile_writer(directory, keep=50):
+    """An ``on_slow`` hook that dumps each slow profile to ``directory``, keeping the newest ``keep``."""
+
+    def write(handler, seconds, stats):
+        try:
+            os.makedirs(directory, exist_ok=True)
+            name = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{handler}-{seconds * 1000:.0f}ms.pstats"
+            stats.dump_stats(os.path.join(directory, name))
+            profiles = sorted(
+                (entry.stat().st_mtime_ns, entry.path) for entry in os.scandir(directory)
+                if entry.name.endswith(".pstats"))
+            for _, path in profiles[:-keep]:
+                os.remove(path)
+        except OSError:
+            pass
+
+    return write
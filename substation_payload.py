@@ -0,0 +1,148 @@
+import base64
+import gzip
+import json
+from contextlib import nullcontext
+
+import numpy as np
+from flask import Response, g, jsonify, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Attribute values plotly.js would assume anyway, by trace type ("*" for all)
+TRACE_DEFAULTS = {
+    "*": {"visible": True, "showlegend": True, "xaxis": "x", "yaxis": "y", "legendgroup": ""},
+    "scatter": {"orientation": "v", "line": {"dash": "solid"}, "marker": {"symbol": "circle"}},
+    "pie": {"domain": {"x": [0.0, 1.0], "y": [0.0, 1.0]}},
+}
+
+
+def _slim_array(array):
+    if array.dtype.kind == "f" and array.dtype.itemsize > 4:
+        return array.astype(np.float32)
+    return array
+
+
+def _slim_value(value, digits):
+    if isinstance(value, dict):
+        # Plotly sends numeric arrays as base64 typed arrays
+        if "bdata" in value and "dtype" in value and value["dtype"] == "f8":
+            array = np.frombuffer(base64.b64decode(value["bdata"]), dtype="<f8").astype("<f4")
+            return {**value, "dtype": "f4", "bdata": base64.b64encode(array.tobytes()).decode("ascii")}
+        return {k: _slim_value(v, digits) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_slim_value(v, digits) for v in value]
+    if isinstance(value, np.ndarray):
+        return _slim_array(value)
+    if isinstance(value, float) and value == value and value not in (float("inf"), float("-inf")):
+        return float(f"{value:.{digits}g}")
+    return value
+
+
+def _drop_defaults(trace, defaults):
+    slim = {}
+    for key, value in trace.items():
+        default = defaults.get(key)
+        if isinstance(value, dict) and isinstance(default, dict):
+            value = _drop_defaults(value, default)
+            if not value:
+                continue
+        elif key in defaults and value == default:
+            continue
+        slim[key] = value
+    return slim
+
+
+def slim_figure(fig, digits=6):
+    """Plotly figure as a dict trimmed for the wire.
+
+    Floats keep ``digits`` significant digits and float arrays go out as
+    float32. Attributes set to what plotly.js assumes anyway are dropped,
+    and the template keeps trace defaults only for the trace types in use.
+    """
+    figure = fig.to_plotly_json()
+    layout = dict(figure.get("layout", {}))
+    traces = []
+    for trace in figure.get("data", []):
+        kind = trace.get("type", "scatter")
+        defaults = {**TRACE_DEFAULTS["*"], **TRACE_DEFAULTS.get(kind, {})}
+        traces.append(_drop_defaults(trace, defaults))
+    template = layout.get("template")
+    if template:
+        used = {trace.get("type", "scatter") for trace in traces}
+        data = {kind: styles for kind, styles in template.get("data", {}).items() if kind in used}
+        layout["template"] = {**template, "data": data}
+    return _slim_value({"data": traces, "layout": layout}, digits)
+
+
+def json_size(value):
+    """Bytes of ``value`` as Dash would encode it."""
+    from plotly.utils import PlotlyJSONEncoder
+
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if hasattr(value, "to_plotly_json"):
+        value = value.to_plotly_json()
+    return len(json.dumps(value, cls=PlotlyJSONEncoder, separators=(",", ":")).encode("utf-8"))
+
+
+def slim_html(html):
+    """Drop indentation and blank lines from a rendered map document.
+
+    The folium templates only indent; none of their strings span lines.
+    """
+    return "\n".join(line for line in (line.strip() for line in html.splitlines()) if line)
+
+
+def compress_responses(server, min_bytes=1024, gzip_level=6, brotli_quality=4, stage=None):
+    """Compress responses with brotli (when installed) or gzip, as the client accepts.
+
+    Bodies under ``min_bytes``, streamed or pass-through responses (static
+    files) and anything already encoded are sent as they are. The uncompressed
+    size is left in ``g.uncompressed_bytes`` for hooks that run after this one,
+    and the compression itself is timed through ``stage`` when given.
+    """
+    timed = stage or (lambda name: nullcontext())
+
+    @server.after_request
+    def compress(response):
+        if response.direct_passthrough or response.is_streamed or not 200 <= response.status_code < 300 \
+                or "Content-Encoding" in response.headers:
+            return response
+        response.vary.add("Accept-Encoding")
+        accepted = request.accept_encodings
+        encoding = "br" if brotli is not None and accepted["br"] else "gzip" if accepted["gzip"] else None
+        data = response.get_data()
+        if encoding is None or len(data) < min_bytes:
+            return response
+
+        with timed("compress"):
+            if encoding == "br":
+                body = brotli.compress(data, quality=brotli_quality)
+            else:
+                body = gzip.compress(data, compresslevel=gzip_level)
+        g.uncompressed_bytes = len(data)
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+
+def conditional_json(tag, build):
+    """``build()`` as a JSON response under the ETag ``tag``, or 304 Not Modified.
+
+    ``build`` returns a JSON-safe value, or a string already encoded. A
+    request whose If-None-Match already names ``tag`` gets an empty 304
+    without ``build`` running, so polling an unchanged result costs a header
+    comparison. The tag is weak: compression changes the bytes, not the
+    content. ``no-cache`` lets clients keep the body but revalidate each use.
+    """
+    if request.if_none_match.contains_weak(tag):
+        response = Response(status=304)
+    else:
+        body = build()
+        response = Response(body, mimetype="application/json") if isinstance(body, str) else jsonify(body)
+    response.set_etag(tag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
@@ -0,0 +1,237 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from substation_data import CACHE_DIR, SOURCE_PATH, load_versioned, read_compacted, write_compacted
+from substation_delta import DELTA_DIR, delta_sha, delta_version, list_deltas, load_delta, merge_delta
+from substation_index import FilterIndex, SpendCube
+from substation_table import TableIndex
+
+
+class Snapshot:
+    """One version of the dataset together with everything derived from it.
+
+    A snapshot is never modified after it is built: a reload builds a new one
+    and swaps it in, so a request that picked up a snapshot finishes on it.
+    ``source`` is the workbook's sha256 and ``deltas`` the (file name, sha256)
+    pairs applied on top of it. A snapshot derived from ``parent`` by a delta
+    keeps the positions it ``changed`` and a small FilterIndex over the old
+    and new versions of those rows, so results cached for the parent can be
+    carried over.
+    """
+
+    def __init__(self, df, version, source=None, deltas=(), filter_index=None, spend_cube=None,
+                 table_index=None, parent=None, changed=None, changes=None):
+        self.df = df
+        self.version = version
+        self.source = source or version
+        self.deltas = list(deltas)
+        self.filter_index = filter_index or FilterIndex(df)
+        self.spend_cube = spend_cube or SpendCube(df, self.filter_index)
+        self.table_index = table_index or TableIndex(df, self.filter_index)
+        self.parent = parent
+        self.changed = changed
+        self.changes = changes
+        self.regions = self.filter_index.region.values
+        self.ownerships = self.filter_index.ownership.values
+        self.years = self.spend_cube.years.tolist()
+        self.year_range = [int(self.years[0]), int(self.years[-1])] if self.years else [0, 0]
+
+    def apply_delta(self, delta, name, sha):
+        """Snapshot with ``delta`` upserted, its indexes and cube patched from this one's."""
+        df, positions = merge_delta(self.df, delta, self.table_index.columns["Substation Name"])
+        filter_index = self.filter_index.updated(df, positions)
+        return Snapshot(
+            df, delta_version(self.version, sha),
+            source=self.source,
+            deltas=self.deltas + [(name, sha)],
+            filter_index=filter_index,
+            spend_cube=self.spend_cube.updated(df, filter_index, positions),
+            table_index=self.table_index.updated(df, filter_index, positions),
+            parent=self.version,
+            changed=positions,
+            changes=FilterIndex(pd.concat([self.df.take(positions[positions < len(self.df)]), df.take(positions)])),
+        )
+
+    def touches(self, filters):
+        """Whether the delta changed any row matching ``filters``, before or after."""
+        return len(self.changes.rows(**filters)) > 0
+
+    def carry_rows(self, rows, filters):
+        """Rows matching ``filters`` here, given ``rows`` matched them in the parent."""
+        hits = self.changes.rows(**filters)
+        before = self.changes.size - len(self.changed)
+        added = self.changed[hits[hits >= before] - before]
+        return np.union1d(np.setdiff1d(rows, self.changed, assume_unique=True), added)
+
+
+class SnapshotManager:
+    """Holds the current Snapshot and follows changes to the workbook and delta files.
+
+    A daemon thread polls the workbook's mtime and size and the delta
+    directory every ``interval`` seconds (0 disables it). New delta files are
+    applied incrementally; anything else (a new workbook, an edited or removed
+    delta) reloads the workbook plus every delta. Each new snapshot is built on
+    that thread, swapped in with one assignment and reported to
+    ``on_swap(old, new)``. Once ``compact_after`` deltas sit on top of the last
+    compacted snapshot, the merged frame is written back as the new base.
+    The dataset itself loads on first access to ``current`` (or ``load()``),
+    and the thread starts on first use in each process, so forked gunicorn
+    workers get their own.
+    """
+
+    def __init__(self, path=SOURCE_PATH, cache_dir=CACHE_DIR, delta_dir=DELTA_DIR, interval=5.0,
+                 compact_after=20, on_swap=None):
+        self.path = path
+        self.cache_dir = cache_dir
+        self.delta_dir = delta_dir
+        self.interval = interval
+        self.compact_after = compact_after
+        self.on_swap = on_swap
+        self.reloads = 0
+        self.compactions = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watcher_pid = None
+        self._source_stamp = None
+        self._delta_stamp = []
+        self._current = None
+        self._mapped = set()
+
+    @property
+    def current(self):
+        return self.load()
+
+    @current.setter
+    def current(self, snapshot):
+        self._current = snapshot
+
+    def load(self):
+        """The current snapshot, reading the workbook and deltas first if nothing is loaded yet."""
+        if self._current is None:
+            with self._reload_lock:
+                if self._current is None:
+                    self._source_stamp = self._stat()
+                    self._delta_stamp = list_deltas(self.delta_dir)
+                    self._current = self._load(self._delta_stamp)
+        return self._current
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self, deltas):
+        """The workbook, or its latest compacted snapshot, plus every delta in ``deltas``."""
+        # Whichever worker writes a new snapshot prunes old ones, but not those this one still maps
+        df, source = load_versioned(self.path, self.cache_dir, keep=self._mapped)
+        snapshot = Snapshot(df, source)
+        pending = [name for name, _, _ in deltas]
+
+        compacted = read_compacted(source, self.cache_dir)
+        if compacted is not None:
+            compacted_df, version, folded = compacted
+            # Folded deltas are only hashed; parsing them would cost what compaction saves
+            shas = [delta_sha(self.delta_dir, name) for name in pending[:len(folded)]]
+            if folded == list(zip(pending, shas)):
+                snapshot = Snapshot(compacted_df, version, source=source, deltas=folded)
+                pending = pending[len(folded):]
+        self._compacted = len(snapshot.deltas)
+        self._mapped = {source, snapshot.version}
+
+        for name in pending:
+            snapshot = self._apply(snapshot, name)
+        return snapshot
+
+    def _apply(self, snapshot, name):
+        try:
+            delta, sha = load_delta(self.delta_dir, name)
+            return snapshot.apply_delta(delta, name, sha)
+        except Exception as exc:
+            # A malformed delta is skipped (the same way in every worker)
+            self.last_error = f"{name}: {exc!r}"
+            return snapshot
+
+    def get(self):
+        self._ensure_watcher()
+        return self.current
+
+    def _ensure_watcher(self):
+        if self.interval <= 0 or self._watcher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+            threading.Thread(target=self._watch, name="dataset-watcher", daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            self.check()
+
+    def check(self):
+        """Pick up workbook and delta changes; True when a new snapshot was swapped in."""
+        self.load()
+        swaps = []
+        with self._reload_lock:
+            source = self._stat()
+            deltas = list_deltas(self.delta_dir)
+            if source is None or (source == self._source_stamp and deltas == self._delta_stamp):
+                return False
+            incremental = source == self._source_stamp and deltas[:len(self._delta_stamp)] == self._delta_stamp
+            applied = len(self._delta_stamp)
+            self._source_stamp, self._delta_stamp = source, deltas
+            try:
+                if incremental:
+                    for name, _, _ in deltas[applied:]:
+                        snapshot = self._apply(self.current, name)
+                        if snapshot is not self.current:
+                            swaps.append((self.current, snapshot))
+                            self.current = snapshot
+                else:
+                    snapshot = self._load(deltas)
+                    if snapshot.version != self.current.version:
+                        swaps.append((self.current, snapshot))
+                        self.current = snapshot
+            except Exception as exc:
+                # Typically a workbook caught mid-write; its next mtime change retries
+                self.last_error = repr(exc)
+            if not swaps:
+                return False
+            self.reloads += len(swaps)
+            self._compact()
+
+        if self.on_swap is not None:
+            for old, new in swaps:
+                self.on_swap(old, new)
+        return True
+
+    def _compact(self):
+        snapshot = self.current
+        if len(snapshot.deltas) - self._compacted < self.compact_after:
+            return
+        try:
+            done = write_compacted(snapshot.df, snapshot.version, snapshot.source, snapshot.deltas, self.cache_dir)
+        except OSError as exc:
+            self.last_error = repr(exc)
+            return
+        if done:
+            self._compacted = len(snapshot.deltas)
+            self.compactions += 1
+
+    def stats(self):
+        return {
+            "version": self.current.version[:12],
+            "rows": len(self.current.df),
+            "deltas": len(self.current.deltas),
+            "reloads": self.reloads,
+            "compactions": self.compactions,
+            "last_error": self.last_error,
+        }
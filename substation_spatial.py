@@ -0,0 +1,233 @@
+import copy
+
+import numpy as np
+
+# scipy is imported where it is used: it is the slowest import here, and only
+# needed once a snapshot is indexed or a network drawn
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def unit_vectors(lat, lon):
+    """Project lat/lon degrees onto the unit sphere.
+
+    Chord length between these points grows monotonically with great-circle
+    distance, so Euclidean KD-tree queries rank neighbours by haversine.
+    """
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def spanning_edges(xyz, k=8):
+    """Approximate Euclidean minimum spanning tree as (i, j) index arrays.
+
+    The MST is taken over the k-nearest-neighbour graph; if that graph splits
+    into several components they are joined along a spanning tree of their
+    centroids, using the closest pair of points between joined components.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components, minimum_spanning_tree
+    from scipy.spatial import cKDTree
+
+    n = len(xyz)
+    if n < 2:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    tree = cKDTree(xyz)
+    k = min(k + 1, n)
+    dist, idx = tree.query(xyz, k=k)
+    rows = np.repeat(np.arange(n), k - 1)
+    cols = idx[:, 1:].ravel()
+    # Coincident substations are still connected: zero weights mean "no edge"
+    weights = dist[:, 1:].ravel() + 1e-12
+    graph = coo_matrix((weights, (rows, cols)), shape=(n, n)).tocsr()
+
+    count, labels = connected_components(graph, directed=False)
+    if count > 1:
+        extra_i, extra_j, extra_w = _bridge_components(xyz, labels, count, k - 1)
+        graph = coo_matrix(
+            (np.concatenate([weights, extra_w]),
+             (np.concatenate([rows, extra_i]), np.concatenate([cols, extra_j]))),
+            shape=(n, n),
+        ).tocsr()
+
+    mst = minimum_spanning_tree(graph).tocoo()
+    return mst.row, mst.col
+
+
+def _bridge_components(xyz, labels, count, k):
+    from scipy.spatial import cKDTree
+
+    members = np.argsort(labels, kind="stable")
+    bounds = np.searchsorted(labels[members], np.arange(count + 1))
+    centroids = np.stack([np.bincount(labels, weights=xyz[:, d], minlength=count) for d in range(3)], axis=1)
+    centroids /= np.bincount(labels, minlength=count)[:, None]
+
+    trees = {}
+    out_i, out_j, out_w = [], [], []
+    for a, b in zip(*spanning_edges(centroids, k)):
+        points_a = members[bounds[a]:bounds[a + 1]]
+        points_b = members[bounds[b]:bounds[b + 1]]
+        if b not in trees:
+            trees[b] = cKDTree(xyz[points_b])
+        dist, nearest = trees[b].query(xyz[points_a])
+        best = int(np.argmin(dist))
+        out_i.append(points_a[best])
+        out_j.append(points_b[nearest[best]])
+        out_w.append(dist[best] + 1e-12)
+    return np.array(out_i, dtype=np.intp), np.array(out_j, dtype=np.intp), np.array(out_w)
+
+
+def network_segments(dff, k=8):
+    """Per-region spanning-tree segments as {region: float array (m, 2, 2)} of lat/lon pairs."""
+    dff_map = dff.dropna(subset=["Latitude", "Longitude"])
+    lat = dff_map["Latitude"].to_numpy(dtype=float)
+    lon = dff_map["Longitude"].to_numpy(dtype=float)
+    coords = np.column_stack((lat, lon))
+    regions = dff_map["Region"].to_numpy(dtype=object).astype(str)
+
+    segments = {}
+    for region in np.unique(regions):
+        points = np.flatnonzero(regions == region)
+        i, j = spanning_edges(unit_vectors(lat[points], lon[points]), k)
+        if not len(i):
+            continue
+        pairs = np.stack((coords[points[i]], coords[points[j]]), axis=1)
+        # Co-located substations give zero-length segments that draw nothing
+        segments[str(region)] = pairs[np.any(pairs[:, 0] != pairs[:, 1], axis=1)]
+    return segments
+
+
+def chord_length(distance_km):
+    return 2.0 * np.sin(np.asarray(distance_km, dtype=float) / (2.0 * EARTH_RADIUS_KM))
+
+
+def chord_to_km(chord):
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2.0, 0.0, 1.0))
+
+
+class SpatialIndex:
+    """KD-tree over sphere-projected coordinates plus a latitude-sorted index.
+
+    Radius and k-nearest queries use the KD-tree (chord length is monotone in
+    great-circle distance); bounding boxes binary-search the latitude band and
+    check longitudes only inside it. All queries return row positions into the
+    frame the index was built from; rows without coordinates are never returned.
+
+    cKDTree cannot be modified, so ``updated`` masks moved rows out of the
+    tree and keeps their new coordinates in a small overlay that every query
+    scans directly; the tree is rebuilt once the overlay outgrows
+    OVERLAY_FRACTION of it.
+    """
+
+    OVERLAY_FRACTION = 0.05
+    OVERLAY_MIN = 4096
+
+    def __init__(self, df):
+        from scipy.spatial import cKDTree
+
+        lat = df["Latitude"].to_numpy(dtype=float)
+        lon = df["Longitude"].to_numpy(dtype=float)
+        self.row_lat = lat
+        self.row_lon = lon
+        self.positions = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+        self.lat = lat[self.positions]
+        self.lon = lon[self.positions]
+        self.xyz = unit_vectors(self.lat, self.lon)
+        self.tree = cKDTree(self.xyz) if len(self.positions) else None
+        self.lat_order = np.argsort(self.lat, kind="stable")
+        self.sorted_lat = self.lat[self.lat_order]
+        # Tree points superseded by updates, and the rows added since the build
+        self.live = None
+        self.dead = 0
+        self.extra = np.empty(0, dtype=np.intp)
+        self.extra_xyz = np.empty((0, 3))
+
+    def _alive(self, local):
+        return local if self.live is None else local[self.live[local]]
+
+    def updated(self, df, positions):
+        """Index for ``df``, which differs from the indexed frame only at ``positions``."""
+        lat = df["Latitude"].to_numpy(dtype=float)
+        lon = df["Longitude"].to_numpy(dtype=float)
+        before = np.full((2, len(positions)), np.nan)
+        old = positions < len(self.row_lat)
+        before[0, old] = self.row_lat[positions[old]]
+        before[1, old] = self.row_lon[positions[old]]
+        after = np.stack((lat[positions], lon[positions]))
+        moved = positions[~((before == after) | (np.isnan(before) & np.isnan(after))).all(axis=0)]
+
+        index = copy.copy(self)
+        index.row_lat, index.row_lon = lat, lon
+        if not len(moved):
+            return index
+
+        live = np.ones(len(self.positions), dtype=bool) if self.live is None else self.live.copy()
+        local = np.searchsorted(self.positions, moved)
+        inside = local < len(self.positions)
+        local, candidates = local[inside], moved[inside]
+        live[local[self.positions[local] == candidates]] = False
+        added = moved[~(np.isnan(lat[moved]) | np.isnan(lon[moved]))]
+        extra = np.concatenate([self.extra[~np.isin(self.extra, moved)], added])
+        if len(extra) > max(self.OVERLAY_MIN, self.OVERLAY_FRACTION * len(self.positions)):
+            return SpatialIndex(df)
+
+        index.live, index.dead = live, int((~live).sum())
+        index.extra = extra
+        index.extra_xyz = unit_vectors(lat[extra], lon[extra])
+        return index
+
+    def within_radius(self, lat, lon, radius_km):
+        """Sorted row positions within radius_km of (lat, lon)."""
+        if radius_km is None or radius_km < 0:
+            return np.empty(0, dtype=np.intp)
+        center = unit_vectors([lat], [lon])[0]
+        chord = float(chord_length(radius_km))
+        rows = [self.extra[np.linalg.norm(self.extra_xyz - center, axis=1) <= chord]]
+        if self.tree is not None:
+            hits = np.asarray(self.tree.query_ball_point(center, r=chord), dtype=np.intp)
+            rows.append(self.positions[self._alive(hits)])
+        return np.sort(np.concatenate(rows))
+
+    def nearest(self, lat, lon, k=10):
+        """(row positions, distances in km) of the k nearest substations, closest first."""
+        if k < 1 or (self.tree is None and not len(self.extra)):
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        center = unit_vectors([lat], [lon])[0]
+        rows = [self.extra]
+        chords = [np.linalg.norm(self.extra_xyz - center, axis=1)]
+        if self.tree is not None:
+            # Ask for enough extra neighbours to cover any masked-out ones
+            dist, idx = self.tree.query(center, k=min(int(k) + self.dead, len(self.positions)))
+            dist, idx = np.atleast_1d(dist), np.atleast_1d(idx)
+            alive = np.ones(len(idx), dtype=bool) if self.live is None else self.live[idx]
+            rows.append(self.positions[idx[alive]])
+            chords.append(dist[alive])
+        rows, chords = np.concatenate(rows), np.concatenate(chords)
+        closest = np.argsort(chords, kind="stable")[:int(k)]
+        return rows[closest], chord_to_km(chords[closest])
+
+    def within_bbox(self, south, west, north, east):
+        """Sorted row positions inside the box; west > east wraps the antimeridian."""
+        lo = np.searchsorted(self.sorted_lat, south, side="left")
+        hi = np.searchsorted(self.sorted_lat, north, side="right")
+        band = self._alive(self.lat_order[lo:hi])
+        rows = [self.positions[band[_in_box(self.lat[band], self.lon[band], south, west, north, east)]]]
+        if len(self.extra):
+            lat, lon = self.row_lat[self.extra], self.row_lon[self.extra]
+            rows.append(self.extra[_in_box(lat, lon, south, west, north, east)])
+        return np.sort(np.concatenate(rows))
+
+    def distances_km(self, rows, lat, lon):
+        """Great-circle distance from (lat, lon) per row position; NaN without coordinates."""
+        xyz = unit_vectors(self.row_lat[rows], self.row_lon[rows])
+        return chord_to_km(np.linalg.norm(xyz - unit_vectors([lat], [lon])[0], axis=1))
+
+
+def _in_box(lat, lon, south, west, north, east):
+    inside = (lat >= south) & (lat <= north)
+    if west <= east:
+        return inside & (lon >= west) & (lon <= east)
+    return inside & ((lon >= west) | (lon <= east))
@@ -0,0 +1,173 @@
+import copy
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+from substation_index import CategoryIndex
+
+TABLE_COLUMNS = ["Substation Name", "Region", "Substation Ownership", "SS_FisYearName"]
+
+_FILTER_PART = re.compile(
+    r"^\s*\{(?P<column>[^}]+)\}\s+"
+    r"(?P<op>[is]?(?:eq|ne|lt|le|gt|ge|contains|datestartswith)|>=|<=|!=|=|<|>|is not blank|is blank)"
+    r"(?:\s+(?P<value>.*?))?\s*$"
+)
+_SYMBOLS = {"=": "eq", "!=": "ne", "<": "lt", "<=": "le", ">": "gt", ">=": "ge"}
+
+
+def _parse_value(text):
+    if text is None:
+        return None
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "'\"`":
+        return text[1:-1].replace("\\" + text[0], text[0])
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def parse_filter_query(query):
+    """Split a DataTable ``filter_query`` into (column, op, case_insensitive, value)."""
+    conditions = []
+    for part in (query or "").split(" && "):
+        match = _FILTER_PART.match(part)
+        if not match:
+            continue
+        op = _SYMBOLS.get(match["op"], match["op"])
+        insensitive = op[0] == "i" and op not in ("is blank", "is not blank")
+        if op[0] in "is" and op not in ("is blank", "is not blank"):
+            op = op[1:]
+        conditions.append((match["column"], op, insensitive, _parse_value(match["value"])))
+    return conditions
+
+
+def _condition(values, op, insensitive, value):
+    """Evaluate one filter condition over an object array of cell values."""
+    series = pd.Series(values, dtype=object)
+    if op == "is blank":
+        return series.isna().to_numpy() | (series.astype(str).str.strip() == "").to_numpy()
+    if op == "is not blank":
+        return ~_condition(values, "is blank", insensitive, value)
+    present = series.notna().to_numpy()
+
+    numeric = isinstance(value, float)
+    if numeric and op != "contains":
+        cells = pd.to_numeric(series, errors="coerce")
+        target = value
+    else:
+        cells = series.astype(str)
+        target = str(int(value)) if numeric and value.is_integer() else str(value)
+        if insensitive:
+            cells = cells.str.lower()
+            target = target.lower()
+
+    if op == "contains":
+        result = cells.str.contains(target, regex=False)
+    elif op == "datestartswith":
+        result = cells.str.startswith(target)
+    elif op == "eq":
+        result = cells == target
+    elif op == "ne":
+        result = cells != target
+    elif op == "lt":
+        result = cells < target
+    elif op == "le":
+        result = cells <= target
+    elif op == "gt":
+        result = cells > target
+    else:
+        result = cells >= target
+    return present & result.fillna(False).to_numpy(dtype=bool)
+
+
+class TableIndex:
+    """Presorted per-column codes so the DataTable can be paged on the server.
+
+    Codes are ranks in each column's sorted values, so sorting a page is an
+    integer sort (or a slice of the precomputed order when nothing is
+    filtered), and filter-query conditions are evaluated once per distinct
+    value when that is cheaper than evaluating every candidate row.
+    """
+
+    def __init__(self, df, filter_index):
+        self.size = len(df)
+        self.columns = {
+            "Substation Name": CategoryIndex(df["Substation Name"]),
+            "Region": filter_index.region,
+            "Substation Ownership": filter_index.ownership,
+            "SS_FisYearName": CategoryIndex(df["SS_FisYearName"]),
+        }
+        self._tables = {name: index.table() for name, index in self.columns.items()}
+
+    def updated(self, df, filter_index, positions):
+        """Index for ``df``, which differs from the indexed frame only at ``positions``."""
+        table = copy.copy(self)
+        table.size = len(df)
+        table.columns = {
+            "Substation Name": self.columns["Substation Name"].updated(
+                positions, df["Substation Name"].iloc[positions].to_numpy(dtype=object)),
+            "Region": filter_index.region,
+            "Substation Ownership": filter_index.ownership,
+            "SS_FisYearName": self.columns["SS_FisYearName"].updated(
+                positions, df["SS_FisYearName"].iloc[positions].to_numpy(dtype=object)),
+        }
+        table._tables = {
+            name: self._tables[name] if index.values is self.columns[name].values else index.table()
+            for name, index in table.columns.items()
+        }
+        return table
+
+    def _apply_filter(self, rows, filter_query):
+        for column, op, insensitive, value in parse_filter_query(filter_query):
+            index = self.columns.get(column)
+            if index is None or not len(rows):
+                continue
+            table = self._tables[column]
+            codes = index.codes[rows]
+            if len(table) <= len(rows):
+                rows = rows[_condition(table, op, insensitive, value)[codes]]
+            else:
+                rows = rows[_condition(table[codes], op, insensitive, value)]
+        return rows
+
+    def _sort(self, rows, sort_by):
+        sort_by = [s for s in sort_by or [] if s.get("column_id") in self.columns]
+        if not sort_by:
+            return rows
+
+        if len(sort_by) == 1:
+            index = self.columns[sort_by[0]["column_id"]]
+            descending = sort_by[0].get("direction") == "desc"
+            if len(rows) == self.size:
+                ordered = index.order
+            elif len(rows) * 16 > self.size:
+                # Large subsets: walk the precomputed order instead of sorting
+                member = np.zeros(self.size, dtype=bool)
+                member[rows] = True
+                ordered = index.order[member[index.order]]
+            else:
+                ordered = rows[np.argsort(index.codes[rows], kind="stable")]
+            return ordered[::-1] if descending else ordered
+
+        keys = []
+        for spec in reversed(sort_by):
+            codes = self.columns[spec["column_id"]].codes[rows].astype(np.int64)
+            keys.append(-codes if spec.get("direction") == "desc" else codes)
+        return rows[np.lexsort(keys)]
+
+    def page(self, rows, page_current, page_size, sort_by=None, filter_query=""):
+        """Return (row positions of the requested page, page count)."""
+        rows = self._apply_filter(rows, filter_query)
+        page_count = max(math.ceil(len(rows) / page_size), 1)
+        page_current = min(max(page_current or 0, 0), page_count - 1)
+        rows = self._sort(rows, sort_by)
+        start = page_current * page_size
+        return rows[start:start + page_size], page_count
+
+    def records(self, rows):
+        return [
+            dict(zip(TABLE_COLUMNS, values))
+            for values in zip(*(self._tables[name][self.columns[name].codes[rows]].tolist() for name in TABLE_COLUMNS))
+        ]